@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+#
+# Host-side micro-benchmark of 1-bpp -> RGB565 glyph expansion.
+#
+# Usage: bench-glyph565.py [-n ROUNDS]
+#
+# "legacy" is the per-byte bit-extract + bytearray([...]) + extend()
+# loop that ili9341.py, ST7735.py and st7789py.py each carried in
+# glyph() (the three copies were identical); "lut" is the shared
+# src/lib/glyph565.py without and "cached" with its RenderCache.  On
+# the host the pure Python fallback of glyph565 runs, not the viper
+# one.  "peak alloc" is the tracemalloc peak over one pass of the
+# text.
+#
+
+import os
+import sys
+import time
+import tracemalloc
+
+import mpyhost
+mpyhost.install()
+
+from glyph565 import Glyph565, RenderCache
+from pnfont import Font
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'fonts')
+TEXT = 'CO2 812ppm 換気してください'
+
+def legacy(glyph, color = 0xffff, background = 0x0000):
+    fg1, fg2 = color >> 8, color & 0xff
+    bg1, bg2 = background >> 8, background & 0xff
+    data = bytearray()
+    for b in glyph.bitmap:
+        p0 = (b >> 7) & 1
+        p1 = (b >> 6) & 1
+        p2 = (b >> 5) & 1
+        p3 = (b >> 4) & 1
+        p4 = (b >> 3) & 1
+        p5 = (b >> 2) & 1
+        p6 = (b >> 1) & 1
+        p7 = (b >> 0) & 1
+        data.extend(bytearray([
+            fg1 * p0 + bg1 * (1 - p0),
+            fg2 * p0 + bg2 * (1 - p0),
+            fg1 * p1 + bg1 * (1 - p1),
+            fg2 * p1 + bg2 * (1 - p1),
+            fg1 * p2 + bg1 * (1 - p2),
+            fg2 * p2 + bg2 * (1 - p2),
+            fg1 * p3 + bg1 * (1 - p3),
+            fg2 * p3 + bg2 * (1 - p3),
+            fg1 * p4 + bg1 * (1 - p4),
+            fg2 * p4 + bg2 * (1 - p4),
+            fg1 * p5 + bg1 * (1 - p5),
+            fg2 * p5 + bg2 * (1 - p5),
+            fg1 * p6 + bg1 * (1 - p6),
+            fg2 * p6 + bg2 * (1 - p6),
+            fg1 * p7 + bg1 * (1 - p7),
+            fg2 * p7 + bg2 * (1 - p7)
+        ]))
+    return data
+
+def bench(expand, glyphs, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for glyph in glyphs:
+            expand(glyph, 0xf800, 0x001f)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for glyph in glyphs:
+        expand(glyph, 0xf800, 0x001f)
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rounds * len(glyphs) / elapsed, allocated
+
+def main(argv):
+    rounds = 200
+    if argv and argv[0] == '-n':
+        rounds = int(argv[1])
+
+    print('{} rounds of "{}"'.format(rounds, TEXT))
+    print('  {:14s} {:8s} {:>10s} {:>12s}'.format('font', 'expand', 'glyphs/s', 'peak alloc B'))
+    for name in ('shnmk12u', 'shnmk14u', 'shnmk16u'):
+        font = Font(os.path.join(FONT_DIR, name + '.pfn'))
+        glyphs = [font.glyph(c) for c in TEXT]
+
+        expander = Glyph565(cache = None)
+        cached = Glyph565(cache = RenderCache())
+        expander.expand(glyphs[0]) # build the LUT and buffer outside the loop
+        for label, expand in (('legacy', legacy), ('lut', expander.expand), ('cached', cached.expand)):
+            rate, allocated = bench(expand, glyphs, rounds)
+            print('  {:14s} {:8s} {:10.0f} {:12.0f}'.format(name, label, rate, allocated))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+#
+# Host-side benchmark of umqtt.simple2 against a local broker stand-in.
+#
+# Usage: bench-mqtt.py [-n PACKETS] [-s PAYLOAD_SIZE]
+#
+# "legacy" is the original per-byte poll+read(1) receive path and the
+# original multi-write publish path, kept here for comparison;
+# "buffered" is the current src/lib/umqtt/simple2.py.
+#
+# The last section compares inbound message latency of the apps'
+# polling loop (check_msg() + sleep(1)) with src/lib/asyncmqtt.py.
+#
+
+import asyncio
+import random
+import sys
+import threading
+import time
+
+import mpyhost
+mpyhost.install()
+
+from mqttstub import MQTTStub
+from umqtt import simple2, robust2
+
+class Legacy(simple2.MQTTClient):
+    def _fill(self, n):
+        # one poll() and one 1-byte read per received byte
+        super()._fill(self._rend - self._rpos + 1)
+
+    def publish(self, topic, msg, retain=False, qos=0, dup=False):
+        head = bytearray(b'\x30\x00\x00\x00\x00')
+        head[0] |= qos << 1 | retain | int(dup) << 3
+        size = 2 + len(topic) + len(msg)
+        if qos > 0:
+            size += 2
+        self._write(head, self._varlen_encode(size, head, 1))
+        self._write(len(topic).to_bytes(2, 'big'))
+        self._write(topic)
+        if qos > 0:
+            pid = next(self.newpid)
+            self._write(pid.to_bytes(2, 'big'))
+        self._write(msg)
+        if qos > 0:
+            self.rcv_pids[pid] = simple2.ticks_add(simple2.ticks_ms(), self.message_timeout * 1000)
+            return pid
+
+def bench_check_msg(cls, broker, count, payload):
+    received = 0
+
+    def callback(topic, msg, retained, duplicate):
+        nonlocal received
+        received += 1
+
+    client = cls('bench', broker.host, port = broker.port)
+    client.set_callback(callback)
+    client.connect()
+    client.subscribe(b'bench')
+    client.check_msg() # SUBACK
+
+    broker.inject(b'bench', payload, count)
+    start = time.perf_counter()
+    while received < count:
+        client.wait_msg()
+    elapsed = time.perf_counter() - start
+    reads = client.sock.reads
+
+    client.disconnect()
+    return count / elapsed, reads
+
+def bench_publish(cls, broker, count, payload):
+    client = cls('bench', broker.host, port = broker.port)
+    client.connect()
+    base = broker.count()
+
+    start = time.perf_counter()
+    for _ in range(count):
+        client.publish(b'bench', payload)
+    while broker.count() - base < count:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    writes = client.sock.writes
+
+    client.disconnect()
+    return count / elapsed, writes
+
+def bench_drain(cls, broker, count, payload):
+    client = cls('bench', broker.host, port = broker.port)
+    client.connect()
+    queue = [(b'bench', payload, False, 0)] * count
+    base = broker.count()
+
+    start = time.perf_counter()
+    if hasattr(client, 'publish_many'):
+        client.publish_many(queue)
+    else:
+        for topic, msg, retain, qos in queue:
+            client.publish(topic, msg, retain, qos)
+    while broker.count() - base < count:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    writes = client.sock.writes
+
+    client.disconnect()
+    return count / elapsed, writes
+
+def bench_poll_latency(broker, samples):
+    arrived = []
+
+    client = robust2.MQTTClient('bench', broker.host, port = broker.port)
+    client.set_callback(lambda *args: arrived.append(time.perf_counter()))
+    client.connect()
+    client.subscribe(b'alarm')
+    client.check_msg() # SUBACK
+
+    def inject():
+        sent.append(time.perf_counter())
+        broker.inject(b'alarm', b'W, test')
+
+    total, sent = 0, []
+    for _ in range(samples):
+        threading.Timer(random.random(), inject).start()
+        while not arrived:
+            client.check_msg()
+            time.sleep(1)
+        total += arrived.pop() - sent.pop()
+
+    client.disconnect()
+    return total / samples
+
+async def bench_async_latency(broker, samples):
+    from asyncmqtt import MQTTClient
+
+    arrived = []
+
+    client = MQTTClient('bench', broker.host, port = broker.port,
+                        keepalive = 60, message_timeout = 1)
+    client.set_callback(lambda *args: arrived.append(time.perf_counter()))
+    await client.connect()
+    await client.subscribe(b'alarm')
+    await asyncio.sleep(0.1)
+
+    total = 0
+    for _ in range(samples):
+        await asyncio.sleep(random.random())
+        sent = time.perf_counter()
+        broker.inject(b'alarm', b'W, test')
+        while not arrived:
+            await asyncio.sleep(0.0001)
+        total += arrived.pop() - sent
+
+    # broker outage: the client reconnects and drains its queue by itself
+    broker.kick()
+    base = broker.count()
+    await client.publish(b'co2', b'queued', qos = 1)
+    for _ in range(100):
+        await asyncio.sleep(0.1)
+        if broker.count() > base:
+            break
+    delivered = broker.count() - base
+
+    await client.disconnect()
+    return total / samples, delivered
+
+def main(argv):
+    count, size = 5000, 200
+    while argv and argv[0].startswith('-'):
+        opt = argv.pop(0)
+        if opt == '-n':
+            count = int(argv.pop(0))
+        elif opt == '-s':
+            size = int(argv.pop(0))
+
+    broker = MQTTStub().start()
+    payload = b'x' * size
+
+    print('check_msg/wait_msg: {} packets, {} byte payload'.format(count, size))
+    for name, cls in (('legacy', Legacy), ('buffered', simple2.MQTTClient)):
+        rate, reads = bench_check_msg(cls, broker, count, payload)
+        print('  {:10s} {:10.0f} packets/s {:8d} reads'.format(name, rate, reads))
+
+    print('publish: {} packets, {} byte payload'.format(count, size))
+    for name, cls in (('legacy', Legacy), ('buffered', simple2.MQTTClient)):
+        rate, writes = bench_publish(cls, broker, count, payload)
+        print('  {:10s} {:10.0f} packets/s {:8d} writes'.format(name, rate, writes))
+
+    print('queue drain: {} packets, {} byte payload'.format(count, size))
+    for name, cls in (('legacy', Legacy), ('buffered', simple2.MQTTClient),
+                      ('batched', robust2.MQTTClient)):
+        rate, writes = bench_drain(cls, broker, count, payload)
+        print('  {:10s} {:10.0f} packets/s {:8d} writes'.format(name, rate, writes))
+
+    samples = 5
+    print('inbound latency: {} messages'.format(samples))
+    latency = bench_poll_latency(broker, samples)
+    print('  {:10s} {:10.1f} ms'.format('polling', latency * 1000))
+    latency, delivered = asyncio.run(bench_async_latency(broker, samples))
+    print('  {:10s} {:10.1f} ms   (redelivered after outage: {})'.format('asyncio', latency * 1000, delivered))
+
+    broker.stop()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
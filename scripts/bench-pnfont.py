@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+#
+# Host-side benchmark of src/lib/pnfont.py lookup modes.
+#
+# Usage: bench-pnfont.py [-n ROUNDS] [FONT.pfn ...]
+#   Defaults to the fonts shipped in src/fonts, plus their PFN v2
+#   conversions made by makepfn -2 (needs ruby).
+#
+# Glyph cache is disabled so that every glyph() is a real lookup.
+# Besides host time, the number of open/seek/read calls per glyph is
+# reported; on the board each of them is a flash access.
+#
+
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import mpyhost
+mpyhost.install()
+
+import pnfont
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_DIR = os.path.join(SCRIPT_DIR, '..', 'src', 'fonts')
+TEXT = 'CO2 812ppm E/T 3/120 24.8℃ 41% 換気してください 二酸化炭素濃度が高くなっています'
+MODES = ('file', 'index', 'resident')
+
+class CountingFile:
+    def __init__(self, fp, stats):
+        self.fp, self.stats = fp, stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fp.close()
+
+    def seek(self, pos, whence = 0):
+        self.stats['seek'] += 1
+        return self.fp.seek(pos, whence)
+
+    def read(self, n = -1):
+        self.stats['read'] += 1
+        return self.fp.read(n)
+
+    def readinto(self, buf):
+        self.stats['read'] += 1
+        return self.fp.readinto(buf)
+
+    def close(self):
+        self.fp.close()
+
+def counting_open(stats):
+    def _open(path, mode = 'r'):
+        stats['open'] += 1
+        return CountingFile(open(path, mode), stats)
+    return _open
+
+def bench(path, mode, rounds):
+    stats = {'open': 0, 'seek': 0, 'read': 0}
+    pnfont.open = counting_open(stats)
+    try:
+        start = time.perf_counter()
+        font = pnfont.Font(path, cache_size = 0, mode = mode)
+        setup = time.perf_counter() - start
+        setup_io = stats['seek'] + stats['read']
+
+        for key in stats:
+            stats[key] = 0
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for char in TEXT:
+                font.glyph(char)
+        elapsed = time.perf_counter() - start
+        font.close()
+    finally:
+        del pnfont.open
+
+    lookups = rounds * len(TEXT)
+    ram = font.index_size() + font.resident_size()
+    return setup, setup_io, lookups / elapsed, {k: v / lookups for k, v in stats.items()}, ram
+
+def main(argv):
+    rounds = 200
+    if argv and argv[0] == '-n':
+        argv.pop(0)
+        rounds = int(argv.pop(0))
+    paths = argv or sorted(glob.glob(os.path.join(FONT_DIR, '*.pfn')))
+    tmpdir = tempfile.TemporaryDirectory()
+    if not argv:
+        paths = [p for path in paths for p in (path, convert_v2(path, tmpdir.name)) if p]
+
+    print('{} rounds of {} chars, glyph cache disabled'.format(rounds, len(TEXT)))
+    print('  {:14s} {:>2s} {:>7s} {:8s} {:>9s} {:>8s} {:>12s} {:>6s} {:>6s} {:>6s} {:>8s}'.format(
+        'font', 'v', 'size', 'mode', 'setup ms', 'setup io', 'glyphs/s', 'open', 'seek', 'read', 'RAM'))
+    for path in paths:
+        with open(path, 'rb') as fp:
+            version = fp.read(8)[7]
+        for mode in MODES:
+            setup, setup_io, rate, ops, ram = bench(path, mode, rounds)
+            print('  {:14s} {:2d} {:7d} {:8s} {:9.1f} {:8d} {:12.0f} {:6.2f} {:6.2f} {:6.2f} {:8d}'.format(
+                os.path.basename(path), version & 0x7f, os.path.getsize(path), mode, setup * 1000, setup_io, rate,
+                ops['open'], ops['seek'], ops['read'], ram))
+
+def convert_v2(path, tmpdir):
+    """Return PFN v2 copy of PATH in TMPDIR, or None without ruby.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    out = os.path.join(tmpdir, name + '.pfn')
+    try:
+        with open(out, 'wb') as fp:
+            subprocess.run(['ruby', os.path.join(SCRIPT_DIR, 'makepfn'), '-2', '-n', name[:8].ljust(8), path],
+                           stdout = fp, check = True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
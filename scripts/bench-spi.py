@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+#
+# Host-side count of SPI traffic of the panel drivers.
+#
+# Usage: bench-spi.py
+#
+# Each driver runs on a spistub.CountingSPI; for every operation the
+# number of transactions (CS assertions), spi.write() calls, DC
+# transitions and bytes written are reported, plus host time.
+#
+
+import sys
+import time
+
+import mpyhost
+import spistub
+mpyhost.install()
+
+spi_tft = spistub.CountingSPI()
+spistub.install(spi_tft, cs = 'tft-cs', dc = 'tft-dc')
+
+from display import PinotDisplay
+from ili9341 import ILI934X
+from pnfont import Font
+from ST7735 import TFT
+from st7789py import ST7789
+
+import os
+FONT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'fonts', 'shnmk16u.pfn')
+TEXT = 'CO2 812ppm 換気して'
+
+def panels():
+    spi = spistub.CountingSPI()
+    yield 'ILI934X', ILI934X(spi, cs = spi.pin(17), dc = spi.dc_pin(5), rst = spistub.Pin(4)), spi
+    yield 'TFT', TFT(spi_tft, 'tft-dc', 'rst', 'tft-cs'), spi_tft
+    spi = spistub.CountingSPI()
+    yield 'ST7789', ST7789(spi, 320, 240, reset = spistub.Pin(4), dc = spi.dc_pin(5), cs = spi.pin(17)), spi
+
+def operations(font):
+    glyphs = [font.glyph(c) for c in TEXT]
+
+    def pixels(panel):
+        if isinstance(panel, TFT):
+            for i in range(100):
+                panel.pixel((i, i), 0x001f)
+        else:
+            for i in range(100):
+                panel.pixel(i, i, 0x001f)
+
+    def rects(panel):
+        for i in range(20):
+            panel.fill_rect(i * 4, i * 4, 16, 16, 0xf800 if i & 1 else 0x07e0)
+
+    def fill(panel):
+        panel.fill(0x001f)
+
+    def glyph(panel):
+        for i, g in enumerate(glyphs):
+            panel.glyph(g, i * 8 % 112, 0)
+
+    def text(panel):
+        disp = PinotDisplay(panel, font)
+        disp.locate(0, 32)
+        disp.text(TEXT)
+
+    return (('pixel x100', pixels), ('fill_rect x20', rects), ('fill', fill),
+            ('glyph x{}'.format(len(glyphs)), glyph), ('text line', text))
+
+def main(argv):
+    font = Font(FONT)
+    print('  {:8s} {:14s} {:>7s} {:>7s} {:>7s} {:>9s} {:>9s}'.format(
+        'panel', 'operation', 'trans', 'writes', 'dc', 'bytes', 'ms'))
+    for name, panel, spi in panels():
+        for label, op in operations(font):
+            spi.reset()
+            start = time.perf_counter()
+            op(panel)
+            elapsed = time.perf_counter() - start
+            s = spi.stats()
+            print('  {:8s} {:14s} {:7d} {:7d} {:7d} {:9d} {:9.2f}'.format(
+                name, label, s['transactions'], s['writes'], s['dc'], s['bytes'], elapsed * 1000))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
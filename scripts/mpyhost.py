@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+#
+# Minimal MicroPython compatibility layer to run src/lib modules on a
+# host CPython for benchmarks.
+#
+# Usage (from another script in this directory):
+#   import mpyhost
+#   mpyhost.install()
+#   from umqtt.simple2 import MQTTClient
+#
+# Only the small subset of MicroPython builtin modules that the
+# benchmarked code touches is provided.  Nothing here is uploaded to
+# the board.
+#
+
+import os
+import select
+import socket
+import struct
+import sys
+import time
+import types
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'lib')
+
+class HostSocket:
+    """MicroPython-like stream socket on top of CPython socket.
+    read/readinto/write block until the requested size is transferred
+    (or EOF), just like a blocking MicroPython socket.
+    """
+
+    def __init__(self, sock = None):
+        self._sock = sock or socket.socket()
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reads, self.writes = 0, 0
+
+    def connect(self, addr):
+        self._sock.connect(addr)
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def read(self, n):
+        buf = bytearray(n)
+        return bytes(buf[:self.readinto(buf)])
+
+    def readinto(self, buf, n = -1):
+        mv = memoryview(buf)
+        if n >= 0:
+            mv = mv[:n]
+        pos = 0
+        self.reads += 1
+        while pos < len(mv):
+            got = self._sock.recv_into(mv[pos:])
+            if got == 0:
+                break
+            pos += got
+        return pos
+
+    def write(self, buf, n = -1):
+        if isinstance(buf, str):
+            buf = buf.encode()
+        mv = memoryview(buf)
+        if n >= 0:
+            mv = mv[:n]
+        self.writes += 1
+        self._sock.sendall(mv)
+        return len(mv)
+
+    def setblocking(self, flag):
+        self._sock.setblocking(flag)
+
+    def close(self):
+        self._sock.close()
+
+def _ticks_ms():
+    return int(time.monotonic() * 1000) & 0x3fffffff
+
+def _ticks_add(ticks, delta):
+    return (ticks + delta) & 0x3fffffff
+
+def _ticks_diff(a, b):
+    return ((a - b + 0x20000000) & 0x3fffffff) - 0x20000000
+
+def _module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    sys.modules[name] = mod
+    return mod
+
+def install():
+    """Register MicroPython module names and put src/lib on sys.path.
+    """
+    _module('usocket',
+            socket = HostSocket,
+            getaddrinfo = socket.getaddrinfo)
+    _module('uselect',
+            poll = select.poll,
+            POLLIN = select.POLLIN,
+            POLLOUT = select.POLLOUT)
+    _module('utime',
+            ticks_ms = _ticks_ms,
+            ticks_add = _ticks_add,
+            ticks_diff = _ticks_diff,
+            sleep = time.sleep,
+            sleep_ms = lambda ms: time.sleep(ms / 1000))
+    _module('ustruct', **{k: getattr(struct, k) for k in ('pack', 'pack_into', 'unpack', 'unpack_from', 'calcsize')})
+    _module('micropython',
+            const = lambda x: x,
+            native = lambda f: f,
+            viper = lambda f: f)
+
+    import builtins
+    builtins.const = lambda x: x
+
+    for name in ('ticks_ms', 'ticks_add', 'ticks_diff', 'sleep_ms'):
+        if not hasattr(time, name):
+            setattr(time, name, getattr(sys.modules['utime'], name))
+
+    if LIB_DIR not in sys.path:
+        sys.path.insert(0, LIB_DIR)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+#
+# Tiny MQTT 3.1.1 broker stand-in for host-side benchmarks and tests.
+#
+# Usage: mqttstub.py [-p PORT]
+#   Accepts CONNECT, SUBSCRIBE, PUBLISH (QoS 0/1), PINGREQ and
+#   DISCONNECT.  PUBLISH is forwarded to every client subscribed to the
+#   exact topic (or '#').  No persistence, no auth, no wildcards.
+#
+# From Python:
+#   broker = MQTTStub().start()
+#   ... connect clients to ('127.0.0.1', broker.port) ...
+#   broker.inject(b'topic', b'payload', count = 1000)
+#   broker.stop()
+#
+
+import socket
+import sys
+import threading
+
+def encode_len(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7f
+        n >>= 7
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+def publish_packet(topic, payload, qos = 0, pid = 1, retain = False):
+    body = len(topic).to_bytes(2, 'big') + topic
+    if qos:
+        body += pid.to_bytes(2, 'big')
+    body += payload
+    return bytes([0x30 | qos << 1 | int(retain)]) + encode_len(len(body)) + body
+
+class Session(threading.Thread):
+    def __init__(self, broker, sock):
+        super().__init__(daemon = True)
+        self.broker, self.sock = broker, sock
+        self.topics = set()
+        self.lock = threading.Lock()
+        self.received = 0
+
+    def send(self, data):
+        with self.lock:
+            self.sock.sendall(data)
+
+    def recv_exact(self, n):
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self.sock.recv(n - len(buf))
+            if not chunk:
+                raise EOFError
+            buf += chunk
+        return bytes(buf)
+
+    def recv_packet(self):
+        head = self.recv_exact(1)[0]
+        length, shift = 0, 0
+        while True:
+            b = self.recv_exact(1)[0]
+            length |= (b & 0x7f) << shift
+            if not b & 0x80:
+                break
+            shift += 7
+        return head, self.recv_exact(length) if length else b''
+
+    def run(self):
+        try:
+            while True:
+                head, body = self.recv_packet()
+                kind = head & 0xf0
+                if kind == 0x10:    # CONNECT
+                    self.send(b'\x20\x02\x00\x00')
+                elif kind == 0x80:  # SUBSCRIBE
+                    pid, pos, granted = body[:2], 2, bytearray()
+                    while pos < len(body):
+                        n = int.from_bytes(body[pos:pos + 2], 'big')
+                        self.topics.add(body[pos + 2:pos + 2 + n])
+                        granted.append(min(body[pos + 2 + n], 1))
+                        pos += 3 + n
+                    self.send(bytes([0x90, 2 + len(granted)]) + pid + granted)
+                elif kind == 0x30:  # PUBLISH
+                    qos = (head >> 1) & 3
+                    n = int.from_bytes(body[:2], 'big')
+                    topic, pos = body[2:2 + n], 2 + n
+                    if qos:
+                        self.send(b'\x40\x02' + body[pos:pos + 2])
+                        pos += 2
+                    self.received += 1
+                    self.broker.forward(topic, body[pos:])
+                elif kind == 0xc0:  # PINGREQ
+                    self.send(b'\xd0\x00')
+                elif kind == 0xe0:  # DISCONNECT
+                    break
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.broker.drop(self)
+            self.sock.close()
+
+class MQTTStub:
+    def __init__(self, host = '127.0.0.1', port = 0):
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(4)
+        self.host, self.port = self.server.getsockname()
+        self.sessions = []
+        self.received = 0
+        self.connected = threading.Event()
+
+    def start(self):
+        threading.Thread(target = self.serve, daemon = True).start()
+        return self
+
+    def serve(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = Session(self, sock)
+            self.sessions.append(session)
+            session.start()
+            self.connected.set()
+
+    def drop(self, session):
+        self.received += session.received
+        if session in self.sessions:
+            self.sessions.remove(session)
+
+    def count(self):
+        """Number of PUBLISH packets received from clients so far.
+        """
+        return self.received + sum(s.received for s in list(self.sessions))
+
+    def forward(self, topic, payload):
+        for session in list(self.sessions):
+            if topic in session.topics or b'#' in session.topics:
+                session.send(publish_packet(topic, payload))
+
+    def inject(self, topic, payload, count = 1, qos = 0):
+        """Send COUNT PUBLISH packets to every connected client in one burst.
+        """
+        data = b''.join(publish_packet(topic, payload, qos, 1 + i % 65535)
+                        for i in range(count))
+        for session in list(self.sessions):
+            session.send(data)
+
+    def kick(self):
+        """Drop all client connections (simulates a broker outage).
+        """
+        for session in list(self.sessions):
+            session.sock.shutdown(socket.SHUT_RDWR)
+
+    def stop(self):
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        self.kick()
+
+################################################################
+## main
+
+if __name__ == '__main__':
+    port = 1883
+    if len(sys.argv) > 2 and sys.argv[1] == '-p':
+        port = int(sys.argv[2])
+    broker = MQTTStub('0.0.0.0', port).start()
+    print('MQTT stub broker listening on port', broker.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        broker.stop()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+#
+# SPI bus and Pin stand-ins for host-side benchmarks of the panel
+# drivers.
+#
+# CountingSPI counts what would go over the wire: transactions (CS
+# asserted .. released), spi.write() calls, bytes written and bytes
+# read.  DC transitions are counted too, since each one splits a
+# command from its data on the bus.
+#
+#   import mpyhost, spistub
+#   mpyhost.install()
+#   spi = spistub.CountingSPI()
+#   spistub.install(spi, cs = 17, dc = 5)   # registers a 'machine' module
+#   panel = ILI934X(spi, cs = spi.pin(), dc = spi.dc_pin(), rst = spistub.Pin(4))
+#   spi.reset()
+#   panel.fill_rect(0, 0, 16, 16, 0xf800)
+#   print(spi.stats())
+#
+
+import sys
+import types
+
+# pin id -> on_change callback, for drivers that create their own pins
+_watched = {}
+
+class Pin:
+    OUT = 1
+    IN = 0
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, id = None, mode = None, pull = None, value = None, on_change = None):
+        self.id = id
+        self.level = value or 0
+        self.on_change = on_change or _watched.get(id)
+
+    def init(self, mode = None, pull = None, value = None):
+        if value is not None:
+            self.value(value)
+
+    def value(self, level = None):
+        if level is None:
+            return self.level
+        level = 1 if level else 0
+        if level != self.level and self.on_change is not None:
+            self.on_change(level)
+        self.level = level
+
+    def __call__(self, level = None):
+        return self.value(level)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+class CountingSPI:
+    """SPI stand-in; pin() and dc_pin() return the CS/DC pins it watches.
+    """
+
+    def __init__(self):
+        self.reset()
+        self.cs_low = False
+
+    def reset(self):
+        self.transactions = 0
+        self.writes = 0
+        self.bytes = 0
+        self.read_bytes = 0
+        self.dc_toggles = 0
+
+    def pin(self, id = None):
+        return Pin(id, value = 1, on_change = self._cs)
+
+    def dc_pin(self, id = None):
+        return Pin(id, on_change = self._dc)
+
+    def _cs(self, level):
+        self.cs_low = level == 0
+        if self.cs_low:
+            self.transactions += 1
+
+    def _dc(self, level):
+        self.dc_toggles += 1
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def write(self, buf):
+        self.writes += 1
+        self.bytes += len(buf)
+
+    def read(self, n, write = 0):
+        self.read_bytes += n
+        return bytes(n)
+
+    def stats(self):
+        return {'transactions': self.transactions,
+                'writes': self.writes,
+                'bytes': self.bytes,
+                'dc': self.dc_toggles}
+
+def install(spi = None, cs = None, dc = None):
+    """Register a 'machine' module with Pin and SPI stand-ins.
+    Pins created later with id CS or DC are watched by SPI.
+    """
+    if spi is not None:
+        _watched[cs] = spi._cs
+        _watched[dc] = spi._dc
+    mod = types.ModuleType('machine')
+    mod.Pin = Pin
+    mod.SPI = CountingSPI
+    sys.modules['machine'] = mod
+    return mod
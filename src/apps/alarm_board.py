@@ -19,11 +19,14 @@ class Display:
 
         from display import PinotDisplay
         from pnfont import Font
+        from jsonconfig import JsonConfig
+
+        console = (JsonConfig().get('display_console') == 'ON')
 
         self.panel = self.__setup_panel(i2c, spi)
         if self.panel is not None:
             self.font  = Font('/fonts/shnmk16u.pfn')
-            self.disp  = PinotDisplay(self.panel, self.font)
+            self.disp  = PinotDisplay(self.panel, self.font, console = console)
             self.disp.clear()
 
     def __setup_panel(self, i2c, spi):
@@ -53,12 +56,24 @@ class Display:
     def echo(self, msg, lineno=0):
         print(msg)
         if self.panel is not None:
+            if self.disp.console:
+                # log-style: one new line per message
+                self.disp.echo(msg)
+                return
             if lineno == 0:
                 self.disp.clear()
             else:
                 self.disp.text('\n')
             self.disp.text(msg)
 
+    def defer(self):
+        if self.panel is not None:
+            self.disp.defer()
+
+    def flush(self):
+        if self.panel is not None:
+            self.disp.flush()
+
 ################
 # Interface to sensors
 
@@ -85,78 +100,8 @@ class PinotSensor:
     def get_value(self):
         return self.thing.lux()
 
-################
-# Interface to publish
-
-class PubSub:
-    """Interface to publish/subscribe
-    """
-
-    def __init__(self, callback_function):
-        from thingspeak import ThingSpeak
-        from jsonconfig import JsonConfig
-        import mqtt
-
-        self.thingspeak = None
-        self.mqtt = None
-
-        config = JsonConfig()
-        apikey = (config.get('thingspeak_apikey') or '')
-        self.mqtt_pub_topic = (config.get('mqtt_pub_topic') or '')
-        self.mqtt_sub_topic = (config.get('mqtt_sub_topic') or '')
-
-        if self.mqtt_pub_topic != '' or self.mqtt_sub_topic != '':
-            print("Setup MQTT connection")
-            self.mqtt = mqtt.mqtt_create_client(config)
-            self.mqtt.connect()
-
-        if self.mqtt_pub_topic != '':
-            print("Setup MQTT pub topic:", self.mqtt_pub_topic)
-
-        if self.mqtt_sub_topic != '':
-            print("Setup MQTT sub topic:", self.mqtt_sub_topic)
-            self.mqtt.set_callback(callback_function)
-            self.mqtt.subscribe(self.mqtt_sub_topic)
-
-        if apikey != '':
-            print("Setup ThingSpeak")
-            self.thingspeak = ThingSpeak(apikey)
-
-    def check_msg(self):
-        return self.mqtt.check_msg()
-
-    def is_conn_issue(self):
-        return self.mqtt.is_conn_issue()
-
-    def reconnect(self):
-        return self.mqtt.reconnect()
-
-    def resubscribe(self):
-        return self.mqtt.resubscribe()
-
-    def publish(self, value):
-        error_count = 0
-
-        if self.mqtt:
-            try:
-                print("Publish to MQTT")
-                self.mqtt.publish(self.mqtt_pub_topic, str(value))
-            except:
-                print("MQTT publish error")
-                error_count += 1
-
-        if self.thingspeak:
-            print("Publish to ThingSpeak")
-            if self.thingspeak.post(field1 = value) != 200:
-                print("ThingSpeak publish error")
-                error_count += 1
-
-        if error_count > 0:
-            print("Publish error")
-            raise "Publish error"
-
 ################################################################
-# main loop thread
+# main loop task
 
 def sound():
     from machine import Pin, PWM
@@ -186,55 +131,54 @@ def mqtt_callback(topic, msg, retained, duplicate):
     sound()
 
 
-def main_thread(thing, pubsub, disp):
-    import time
+async def main_task(thing, pubsub, disp):
+    import uasyncio as asyncio
 
-    print("main_thread start")
+    print("main_task start")
+    await pubsub.start()
     trial, error = 0, 0
 
     while True:
         trial += 1
         value = None
 
-        c = 0
-        while c < 60:
-            if pubsub.is_conn_issue():
-                while pubsub.is_conn_issue():
-                    pubsub.reconnect()
-                    c += 1
-                    time.sleep(1)
-                else:
-                    pubsub.resubscribe()
-            pubsub.check_msg()
-            c += 1
-            time.sleep(1)
+        # MQTT messages are handled by PUBSUB's background task meanwhile
+        await asyncio.sleep(60)
 
         try:
             value = thing.get_value()
-            pubsub.publish(value)
+            await pubsub.publish(value)
         except:
             error += 1
 
         print("Value:", value)
 
         if value is not None:
+            disp.defer()
             disp.echo("V:{:.1f}".format(value))
             disp.echo("E/T {}/{}".format(error, trial), lineno = 1)
+            disp.flush()
 
 ################################################################
 # main
 
-from machine import SoftI2C, Pin, SPI
+from machine import Pin, SPI
+import i2cbus
 import _thread
 
 try:
-    i2c = SoftI2C(scl = Pin(22), sda = Pin(21))
+    i2c = i2cbus.bus(scl = 22, sda = 21)
     spi = SPI(1, baudrate = 40000000, miso = Pin(12), sck = Pin(14), mosi = Pin(13))
     disp = Display(i2c = i2c, spi = spi)
 except:
     disp = Display()
 
+from jsonconfig import JsonConfig
+from pubsub import AsyncPubSub
+import uasyncio as asyncio
+
 thing = PinotSensor(i2c)
-pubsub = PubSub(mqtt_callback)
+pubsub = AsyncPubSub(JsonConfig(), mqtt_callback)
 
-_thread.start_new_thread(main_thread, (thing, pubsub, disp))
+# the event loop runs in its own thread to keep the REPL free
+_thread.start_new_thread(asyncio.run, (main_task(thing, pubsub, disp),))
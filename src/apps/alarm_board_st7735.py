@@ -32,7 +32,7 @@ def setup_panel(name, i2c_or_spi):
         spi = i2c_or_spi
         panel = panel_ili9341(spi) or panel_st7735(spi)
 
-    if isinstance(i2c_or_spi, SoftI2C):
+    if isinstance(i2c_or_spi, i2cbus.I2CBus):
         i2c = i2c_or_spi
         if 0x3c in i2c.scan():
             from ssd1306 import SSD1306_I2C
@@ -63,11 +63,11 @@ class PinotSensor:
         self.addr = addr
         self.thing = SCD30(i2c, addr)
 
-    def get_value(self):
-        import time
+    async def get_value(self):
+        import uasyncio as asyncio
         while self.thing.get_status_ready() != 1:
             print("Wait for CO2 sensor ready.")
-            time.sleep_ms(200)
+            await asyncio.sleep_ms(200)
         return self.thing.read_measurement()
 
 ################
@@ -85,20 +85,23 @@ def mqtt_callback(topic, msg, retained, duplicate):
         disp.text(str(msg, 'utf-8'))
 
 ################################################################
-# main loop thread
+# main loop task
 
-def main_thread(thing, pubsub, disp):
+async def main_task(thing, pubsub, disp):
     import time
+    import uasyncio as asyncio
 
-    print("main_thread start")
+    print("main_task start")
+    await pubsub.start()
     trial, error, pubtime = 0, 0, 0
 
     while True:
         trial += 1
 
         try:
-            value = thing.get_value()
-            pubsub.publish('{{"co2": {:.0f}, "temperature": {:.1f}, "humidity": {:.0f}}}'.format(*value))
+            value = await thing.get_value()
+            await pubsub.publish('{{"co2": {:.0f}, "temperature": {:.1f}, "humidity": {:.0f}}}'.format(*value),
+                           {'co2': value[0], 'temperature': value[1], 'humidity': value[2]})
             pubtime = time.ticks_ms()
         except:
             value = None
@@ -107,32 +110,36 @@ def main_thread(thing, pubsub, disp):
         print("Value:", value)
 
         if value is not None:
+            disp.defer()
             disp.echo("V:{:.0f},{:.1f},{:.0f}\n".format(*value))
             disp.echo("E/T {}/{}".format(error, trial), lineno = 1)
+            disp.flush()
 
-        while time.ticks_diff(time.ticks_ms(), pubtime) < 60000:
-            pubsub.check_msg()
-            time.sleep(1)
+        # MQTT messages are handled by PUBSUB's background task meanwhile
+        await asyncio.sleep_ms(max(0, 60000 - time.ticks_diff(time.ticks_ms(), pubtime)))
 
 ################################################################
 # main
 
 import _thread
 
-from machine import SoftI2C, Pin, SPI
+from machine import Pin, SPI
+import i2cbus
 from display import PinotDisplay
 from pnfont import Font
-from pubsub import PubSub
+from pubsub import AsyncPubSub
 from jsonconfig import JsonConfig
+import uasyncio as asyncio
 jsonconfig = JsonConfig()
 
-i2c = SoftI2C(scl = Pin(19), sda = Pin(18))
+i2c = i2cbus.bus(scl = 19, sda = 18)
 spi = SPI(1, baudrate=40000000, polarity=0, phase=0, sck=Pin(14), mosi=Pin(13), miso=Pin(12))
 
 disp = PinotDisplay(panel = setup_panel('ST7735', spi), font = Font('/fonts/shnmk14u.pfn'))
 disp.clear()
 
 thing = PinotSensor(i2c, 0x61)
-pubsub = PubSub(jsonconfig, mqtt_callback)
+pubsub = AsyncPubSub(jsonconfig, mqtt_callback)
 
-_thread.start_new_thread(main_thread, (thing, pubsub, disp))
+# the event loop runs in its own thread to keep the REPL free
+_thread.start_new_thread(asyncio.run, (main_task(thing, pubsub, disp),))
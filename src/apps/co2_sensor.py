@@ -19,12 +19,41 @@ class Display:
 
         from display import PinotDisplay
         from pnfont import Font
+        from jsonconfig import JsonConfig
+
+        console = (JsonConfig().get('display_console') == 'ON')
 
         self.panel = self.__setup_panel(i2c, spi)
         if self.panel is not None:
             self.font  = Font('/fonts/shnmk16u.pfn')
-            self.disp  = PinotDisplay(self.panel, self.font)
+            self.disp  = PinotDisplay(self.panel, self.font, console = console)
             self.disp.clear()
+            if not self.disp.console:
+                # console mode logs status lines instead
+                self.__setup_screen()
+
+    def __setup_screen(self):
+        """Status fields: values, E/T counters, CO2 trend if wide enough
+        and a CO2 history graph (one column per window) if tall enough.
+        """
+        from widget import Screen, Field, Sparkline
+
+        self.screen = Screen(self.disp)
+        width = self.panel.width
+        self.trend = None
+        if width >= 240:
+            width = 128
+            self.trend = self.screen.add(Sparkline(self.disp, width, 0, self.panel.width - width, 32))
+        self.values = self.screen.add(Field(self.disp, 0, 0, "V:{:.0f},{:.1f},{:.0f}", width = width))
+        self.counts = self.screen.add(Field(self.disp, 0, 16, "E/T {}/{}", width = width))
+
+        self.graph = None
+        if self.panel.height >= 160:
+            from samplering import SampleRing
+            from graph import TrendGraph
+            self.history = SampleRing(self.panel.width, (('co2', 'H'),))
+            self.graph = TrendGraph(self.panel, 0, 40, self.panel.width, min(120, self.panel.height - 48),
+                                    self.history, 'co2', 400, 2000, marks = (1000,))
 
     def __setup_panel(self, i2c, spi):
         """Setup display SD1306 or ILI9341.
@@ -53,13 +82,49 @@ class Display:
     def echo(self, msg, lineno=0):
         print(msg)
         if self.panel is not None:
+            if self.disp.console:
+                # log-style: one new line per message
+                self.disp.echo(msg)
+                return
             if lineno == 0:
                 self.disp.clear()
+                self.screen.invalidate()
+                if self.graph is not None:
+                    self.graph.invalidate()
             else:
                 self.disp.locate(0, lineno * 16)
                 # self.disp.text('\n')
             self.disp.text(msg)
 
+    def status(self, value, error, trial):
+        """Show VALUE (co2, temperature, humidity) and E/T counters,
+        redrawing only the fields that changed.
+        """
+        if self.panel is None or self.disp.console:
+            self.defer()
+            self.echo("V:{:.0f},{:.1f},{:.0f}".format(value[0], value[1], value[2]))
+            self.echo("E/T {}/{}".format(error, trial), lineno = 1)
+            self.flush()
+            return
+        self.values.set(*value)
+        self.counts.set(error, trial)
+        if self.trend is not None:
+            self.trend.push(value[0])
+        self.disp.defer()
+        self.screen.update()
+        if self.graph is not None:
+            self.history.append(value[0])
+            self.graph.update()
+        self.disp.flush()
+
+    def defer(self):
+        if self.panel is not None:
+            self.disp.defer()
+
+    def flush(self):
+        if self.panel is not None:
+            self.disp.flush()
+
 ################
 # Interface to sensors
 
@@ -89,94 +154,35 @@ class PinotSensorSCD30:
 
         print('Setup ASC:',(self.asc_settings=='ON'))
         SCD30.set_automatic_recalibration(self.thing,(self.asc_settings=='ON'))
+        # native rate; readings are aggregated before publishing
+        self.thing.set_measurement_interval(2)
 
-    def get_value(self):
-        import time
+    async def get_value(self):
+        import uasyncio as asyncio
         while self.thing.get_status_ready() != 1:
             print("Wait for CO2 sensor ready.")
-            time.sleep_ms(200)
+            await asyncio.sleep_ms(200)
         return self.thing.read_measurement()
 
 ################
-# Interface to publish
+# Message published
 
-class PubSub:
-    """Interface to publish/subscribe
-    """
-
-    def __init__(self, callback_function):
-        from thingspeak import ThingSpeak
-        from jsonconfig import JsonConfig
-        import mqtt
-
-        self.thingspeak = None
-        self.mqtt = None
-
-        config = JsonConfig()
-        apikey = (config.get('thingspeak_apikey') or '')
-        self.mqtt_pub_topic = (config.get('mqtt_pub_topic') or '')
-        self.mqtt_sub_topic = (config.get('mqtt_sub_topic') or '')
-
-        if self.mqtt_pub_topic != '' or self.mqtt_sub_topic != '':
-            print("Setup MQTT connection")
-            self.mqtt = mqtt.mqtt_create_client(config)
-            try:
-                self.mqtt.connect()
-            except:
-                print("MQTT connect failed")
+# co2 readings with a summary are ~120 bytes; spool them whole
+SPOOL_RECORD_SIZE = 160
 
-        if self.mqtt_pub_topic != '':
-            print("Setup MQTT pub topic:", self.mqtt_pub_topic)
-
-        if self.mqtt_sub_topic != '' and callback_function is not None:
-            print("Setup MQTT sub topic:", self.mqtt_sub_topic)
-            self.mqtt.set_callback(callback_function)
-            self.mqtt.subscribe(self.mqtt_sub_topic)
-            # print("MQTT subscribe failed")
-
-        if apikey != '':
-            print("Setup ThingSpeak")
-            self.thingspeak = ThingSpeak(apikey)
-
-    def check_msg(self):
-        if self.mqtt_pub_topic == '':
-            return False
-        self.mqtt.check_msg()
-
-    def is_conn_issue(self):
-        if self.mqtt_pub_topic == '':
-            return False
-        return self.mqtt.is_conn_issue()
-
-    def reconnect(self):
-        return self.mqtt.reconnect()
-
-    def resubscribe(self):
-        return self.mqtt.resubscribe()
-
-    def publish(self, value):
-        error_count = 0
-
-        if self.mqtt:
-            try:
-                print("MQTT publish topic =", self.mqtt_pub_topic)
-                self.mqtt.publish(self.mqtt_pub_topic, '{{"co2": {:.0f}, "temperature": {:.1f}, "humidity": {:.0f}}}'.format(value[0], value[1], value[2]))
-            except:
-                print("MQTT publish error")
-                error_count += 1
-
-        if self.thingspeak:
-            print("Publish to ThingSpeak")
-            if self.thingspeak.post(field1 = value[0],field2 = value[1],field3 =value[2]) != 200:
-                print("ThingSpeak publish error")
-                error_count += 1
-
-        if error_count > 0:
-            print("Publish error")
-            raise "Publish error"
+def message(value, summary = None):
+    """JSON message for VALUE (co2, temperature, humidity).
+    SUMMARY from Aggregator.summary() adds co2 min/max/median and
+    the number of samples the window is made of.
+    """
+    text = '{{"co2": {:.0f}, "temperature": {:.1f}, "humidity": {:.0f}'.format(value[0], value[1], value[2])
+    if summary:
+        co2 = summary['co2']
+        text += ', "co2_min": {:.0f}, "co2_max": {:.0f}, "co2_median": {:.0f}, "samples": {}'.format(co2['min'], co2['max'], co2['median'], co2['count'])
+    return text + '}'
 
 ################################################################
-# main loop thread
+# main loop task
 
 def mqtt_callback(topic, msg, retained, duplicate):
     import beep
@@ -189,53 +195,64 @@ def mqtt_callback(topic, msg, retained, duplicate):
     else:
         disp.echo(str(msg, 'utf-8'))
 
-def main_thread(thing, pubsub, disp):
+async def main_task(thing, pubsub, disp, window = 60):
+    """Sample THING every 2 seconds and publish one summary
+    (mean, plus co2 min/max/median) every WINDOW seconds.
+    MQTT messages are handled by PUBSUB's background task meanwhile.
+    """
     import time
+    import uasyncio as asyncio
+    from aggregate import Aggregator
 
-    print("main_thread start")
+    print("main_task start")
+    await pubsub.start()
     trial, error = 0, 0
+    agg = Aggregator(('co2', 'temperature', 'humidity'))
 
     while True:
         trial += 1
         print("trial:", trial)
         value = None
+        agg.reset()
+        deadline = time.ticks_add(time.ticks_ms(), window * 1000)
+
+        while time.ticks_diff(deadline, time.ticks_ms()) > 0:
+            try:
+                agg.add(*await thing.get_value())
+            except Exception as e:
+                print("Sensor error:", str(e))
+
+            next_sample = time.ticks_add(time.ticks_ms(), 2000)
+            await asyncio.sleep_ms(max(0, time.ticks_diff(next_sample, time.ticks_ms())))
+
         try:
-            value = thing.get_value()
-            print("Value:", value)
-            pubsub.publish(value)
+            if len(agg) == 0:
+                raise ValueError("no samples")
+            summary = agg.summary()
+            value = (summary['co2']['mean'], summary['temperature']['mean'], summary['humidity']['mean'])
+            print("Value:", value, "samples:", len(agg))
+            await pubsub.publish(message(value, summary),
+                           {'co2': value[0], 'temperature': value[1], 'humidity': value[2]}, value)
         except Exception as e:
             print("Error: value =", value, "error:", str(e))
             error += 1
 
         if value is not None:
-            disp.echo("V:{:.0f},{:.1f},{:.0f}".format(value[0], value[1], value[2]))
-            disp.echo("E/T {}/{}".format(error, trial), lineno = 1)
-
-        c = 0
-        while c < 60:
-            if pubsub.is_conn_issue():
-                while pubsub.is_conn_issue():
-                    pubsub.reconnect()
-                    c += 1
-                    time.sleep(1)
-                else:
-                    pubsub.resubscribe()
-            pubsub.check_msg()
-            c += 1
-            time.sleep(1)
+            disp.status(value, error, trial)
 
 
 ################################################################
 # main
 
-from machine import Pin, SoftI2C, SPI
+from machine import Pin, SPI
+import i2cbus
 import _thread
 from machine import Pin, PWM
 import time
 from beep import Beep
 
 try:
-    i2c = SoftI2C(scl = Pin(22), sda = Pin(21))
+    i2c = i2cbus.bus(scl = 22, sda = 21)
     spi = SPI(1, baudrate = 40000000, miso = Pin(12), sck = Pin(14), mosi = Pin(13))
     disp = Display(i2c = i2c, spi = spi)
 except:
@@ -243,7 +260,14 @@ except:
 
 # disp.clear()
 
+from jsonconfig import JsonConfig
+from pubsub import AsyncPubSub
+import uasyncio as asyncio
+jsonconfig = JsonConfig()
+window = int(jsonconfig.get_str('aggregate_window') or 60)
+
 thing = PinotSensorSCD30(i2c)
-pubsub = PubSub(mqtt_callback)
+pubsub = AsyncPubSub(jsonconfig, mqtt_callback, SPOOL_RECORD_SIZE)
 
-_thread.start_new_thread(main_thread, (thing, pubsub, disp))
+# the event loop runs in its own thread to keep the REPL free
+_thread.start_new_thread(asyncio.run, (main_task(thing, pubsub, disp, window),))
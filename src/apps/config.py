@@ -59,10 +59,11 @@ class Display:
 ################
 # Setup display
 
-from machine import Pin, SoftI2C, SPI
+from machine import Pin, SPI
+import i2cbus
 
 try:
-    i2c = SoftI2C(scl = Pin(22), sda = Pin(21))
+    i2c = i2cbus.bus(scl = 22, sda = 21)
     spi = SPI(1, baudrate = 40000000, miso = Pin(12), sck = Pin(14), mosi = Pin(13))
     disp = Display(i2c = i2c, spi = spi)
 except:
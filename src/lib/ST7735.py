@@ -6,6 +6,8 @@ import machine
 import time
 from math import sqrt
 import ustruct as struct
+from glyph565 import Glyph565
+from spitransport import SPITransport, FILL_PIXELS
 
 #TFTRotations and TFTRGB are bits to set
 # on MADCTL to control display rotation/color layout
@@ -123,6 +125,8 @@ class TFT(object) :
     self.spi = spi
     self.colorData = bytearray(2)
     self.windowLocData = bytearray(4)
+    self._glyph565 = Glyph565()
+    self._transport = SPITransport(spi, self.cs, self.dc, TFT.CASET, TFT.RASET, TFT.RAMWR)
 
   def size( self ) :
     return self._size
@@ -160,41 +164,16 @@ class TFT(object) :
   def pixel( self, aPos, aColor ) :
     '''Draw a pixel at the given position'''
     if 0 <= aPos[0] < self._size[0] and 0 <= aPos[1] < self._size[1]:
-      self._setwindowpoint(aPos)
-      self._pushcolor(aColor)
+      x = self._loc(0, aPos[0])
+      y = self._loc(1, aPos[1])
+      self._transport.pixel(x, y, aColor)
 
   def glyph(self, glyph, x, y, color=0xffff, background=0x0000):
-      fg1, fg2 = struct.pack(">H", color)
-      bg1, bg2  = struct.pack(">H", background)
-      data = bytearray()
-      for b in glyph.bitmap:
-          p0 = (b >> 7) & 1
-          p1 = (b >> 6) & 1
-          p2 = (b >> 5) & 1
-          p3 = (b >> 4) & 1
-          p4 = (b >> 3) & 1
-          p5 = (b >> 2) & 1
-          p6 = (b >> 1) & 1
-          p7 = (b >> 0) & 1
-          data.extend(bytearray([
-              fg1 * p0 + bg1 * (1 - p0),
-              fg2 * p0 + bg2 * (1 - p0),
-              fg1 * p1 + bg1 * (1 - p1),
-              fg2 * p1 + bg2 * (1 - p1),
-              fg1 * p2 + bg1 * (1 - p2),
-              fg2 * p2 + bg2 * (1 - p2),
-              fg1 * p3 + bg1 * (1 - p3),
-              fg2 * p3 + bg2 * (1 - p3),
-              fg1 * p4 + bg1 * (1 - p4),
-              fg2 * p4 + bg2 * (1 - p4),
-              fg1 * p5 + bg1 * (1 - p5),
-              fg2 * p5 + bg2 * (1 - p5),
-              fg1 * p6 + bg1 * (1 - p6),
-              fg2 * p6 + bg2 * (1 - p6),
-              fg1 * p7 + bg1 * (1 - p7),
-              fg2 * p7 + bg2 * (1 - p7)
-          ]))
-      self.image(x, y, x + glyph.width - 1, y + glyph.height - 1, data)
+    data = self._glyph565.expand(glyph, color, background)
+    self.image(x, y, x + glyph.width - 1, y + glyph.height - 1, data)
+
+  def blit565(self, data, x, y, w, h):
+    self.image(x, y, x + w - 1, y + h - 1, data)
 
 #   @micropython.native
   def text( self, aPos, aString, aColor, aFont, aSize = 1, nowrap = False ) :
@@ -366,10 +345,8 @@ class TFT(object) :
       end = (end[0], start[1])
       start = (start[0], tmp)
 
-    self._setwindowloc(start, end)
-    numPixels = (end[0] - start[0] + 1) * (end[1] - start[1] + 1)
-    self._setColor(aColor)
-    self._draw(numPixels)
+    self._transport.fill_window(self._loc(0, start[0]), self._loc(1, start[1]),
+                                self._loc(0, end[0]), self._loc(1, end[1]), aColor)
 
 #   @micropython.native
   def circle( self, aPos, aRadius, aColor ) :
@@ -425,8 +402,8 @@ class TFT(object) :
     self.fillrect((0, 0), self._size, aColor)
 
   def image( self, x0, y0, x1, y1, data ) :
-    self._setwindowloc((x0, y0), (x1, y1))
-    self._writedata(data)
+    self._transport.write_window(self._loc(0, x0), self._loc(1, y0),
+                                 self._loc(0, x1), self._loc(1, y1), data)
 
   def setvscroll(self, tfa, bfa) :
     ''' set vertical scroll area '''
@@ -453,24 +430,27 @@ class TFT(object) :
 
 #   @micropython.native
   def _setColor( self, aColor ) :
-    self.colorData[0] = aColor >> 8
-    self.colorData[1] = aColor
-    self.buf = bytes(self.colorData) * 32
+    self._color = aColor
 
 #   @micropython.native
   def _draw( self, aPixels ) :
     '''Send given color to the device aPixels times.'''
-
+    pattern = self._transport.fill_pattern(self._color)
     self.dc(1)
     self.cs(0)
-    for i in range(aPixels//32):
-      self.spi.write(self.buf)
-    rest = (int(aPixels) % 32)
+    for i in range(aPixels // FILL_PIXELS):
+      self.spi.write(pattern)
+    rest = aPixels % FILL_PIXELS
     if rest > 0:
-        buf2 = bytes(self.colorData) * rest
-        self.spi.write(buf2)
+      self.spi.write(pattern[:rest * 2])
     self.cs(1)
 
+  def _loc( self, aAxis, aValue ) :
+    '''Window coordinate as _setwindowloc() sends it: the offset in
+       the high byte, offset + aValue in the low byte.'''
+    offset = self._offset[aAxis]
+    return offset << 8 | (offset + int(aValue)) & 0xff
+
 #   @micropython.native
   def _setwindowpoint( self, aPos ) :
     '''Set a single point for drawing a color to.'''
@@ -513,19 +493,13 @@ class TFT(object) :
   #@micropython.native
   def _writecommand( self, aCommand ) :
     '''Write given command to the device.'''
-    self.dc(0)
-    self.cs(0)
-    self.spi.write(bytearray([aCommand]))
-    self.cs(1)
+    self._transport.command(aCommand)
 
   #@micropython.native
   def _writedata( self, aData ) :
     '''Write given data to the device.  This may be
        either a single int or a bytearray of values.'''
-    self.dc(1)
-    self.cs(0)
-    self.spi.write(aData)
-    self.cs(1)
+    self._transport.data(aData)
 
   #@micropython.native
   def _pushcolor( self, aColor ) :
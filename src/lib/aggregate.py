@@ -0,0 +1,136 @@
+class P2Quantile:
+    """Streaming quantile estimate with the P-square algorithm
+    (Jain & Chlamtac, 1985): five markers, no sample history.
+
+    >>> median = P2Quantile(0.5)
+    >>> for x in samples:
+    ...     median.add(x)
+    >>> median.value()
+    """
+
+    def __init__(self, p = 0.5):
+        self.p = p
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.q = [0.0] * 5                  # marker heights
+        self.n = [0, 1, 2, 3, 4]            # marker positions
+        self.np = [0.0, 2 * self.p, 4 * self.p, 2 + 2 * self.p, 4.0]
+        self.dn = [0.0, self.p / 2, self.p, (1 + self.p) / 2, 1.0]
+
+    def add(self, x):
+        q, n = self.q, self.n
+
+        if self.count < 5:
+            q[self.count] = x
+            self.count += 1
+            if self.count == 5:
+                q.sort()
+            return
+        self.count += 1
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        for i in range(1, 4):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                h = self._parabolic(i, d)
+                if not q[i - 1] < h < q[i + 1]:
+                    h = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = h
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.q, self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            # exact while the markers are being filled
+            s = sorted(self.q[:self.count])
+            return s[min(int(self.p * self.count), self.count - 1)]
+        return self.q[2]
+
+class Stats:
+    """Running count/min/max/mean and approximate median of one value.
+    """
+
+    def __init__(self):
+        self.median = P2Quantile(0.5)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.median.reset()
+
+    def add(self, x):
+        self.count += 1
+        self.total += x
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        self.median.add(x)
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+class Aggregator:
+    """Per-window summary of multi-field samples in constant memory.
+
+    >>> agg = Aggregator(('co2', 'temperature', 'humidity'))
+    >>> agg.add(812.3, 24.8, 41.0)   # every 2 seconds
+    >>> summary = agg.summary()      # once a window
+    >>> summary['co2']['mean'], summary['co2']['median']
+    >>> agg.reset()
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self.stats = [Stats() for _ in names]
+
+    def __len__(self):
+        return self.stats[0].count if self.stats else 0
+
+    def add(self, *values):
+        for stats, value in zip(self.stats, values):
+            stats.add(value)
+
+    def reset(self):
+        for stats in self.stats:
+            stats.reset()
+
+    def summary(self):
+        """Return {name: {'count', 'min', 'max', 'mean', 'median'}}
+        """
+        result = {}
+        for name, stats in zip(self.names, self.stats):
+            result[name] = {'count': stats.count,
+                            'min': stats.min,
+                            'max': stats.max,
+                            'mean': stats.mean(),
+                            'median': stats.median.value()}
+        return result
@@ -0,0 +1,253 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from utime import ticks_ms, ticks_add, ticks_diff
+from umqtt import simple2, robust2
+
+class MQTTClient(robust2.MQTTClient):
+    """asyncio MQTT client on top of umqtt.robust2
+
+    Packets are encoded and decoded by umqtt.simple2 and unsent or
+    unconfirmed messages follow the robust2 queue semantics, but the
+    socket is an asyncio stream:
+
+      + subscription callbacks fire as soon as a packet arrives
+      + PINGREQ and QoS 1 timeouts are driven by a timer task
+      + lost connections are re-established in the background
+        (resubscribe, then drain the send queue)
+
+    >>> client = MQTTClient('pinot', 'broker.local', keepalive = 60)
+    >>> client.set_callback(callback)
+    >>> await client.connect()
+    >>> await client.subscribe('alarm')
+    >>> await client.publish('co2', '{"co2": 800}')
+    """
+
+    RECONNECT_DELAY = 1
+    RECONNECT_DELAY_MAX = 60
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reader = None
+        self._writer = None
+        self._task = None
+        self._running = False
+
+    ################
+    # stream I/O used by simple2/robust2
+
+    def _write(self, bytes_wr, length = -1):
+        if self._writer is None:
+            raise simple2.MQTTException(8)
+        if length < 0:
+            length = len(bytes_wr)
+        self._writer.write(bytes(memoryview(bytes_wr)[:length]))
+        return length
+
+    async def _drain(self):
+        if self._writer is not None:
+            try:
+                await self._writer.drain()
+            except OSError as e:
+                self.conn_issue = e, 2
+                self._close()
+
+    def _close(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            try:
+                writer.close()
+            except OSError:
+                pass
+
+    async def _recv_packet(self, timeout):
+        reader = self._reader
+        head = await asyncio.wait_for(reader.readexactly(1), timeout)
+        length, shift = 0, 0
+        while True:
+            b = (await reader.readexactly(1))[0]
+            length |= (b & 0x7f) << shift
+            if not b & 0x80:
+                break
+            shift += 7
+        body = await reader.readexactly(length) if length else b''
+        return head[0], body
+
+    async def _open(self, clean_session):
+        if clean_session:
+            self.msg_to_send[:] = []
+            self.msg_to_confirm.clear()
+            self.rcv_pids.clear()
+            self._dlq.clear()
+            self._dlh = 0
+
+        if self.ssl:
+            stream = asyncio.open_connection(self.server, self.port, ssl = True)
+        else:
+            stream = asyncio.open_connection(self.server, self.port)
+        self._reader, self._writer = await asyncio.wait_for(stream, self.socket_timeout)
+
+        try:
+            self._write(self._connect_packet(clean_session))
+            await self._writer.drain()
+            connack = await asyncio.wait_for(self._reader.readexactly(4), self.socket_timeout)
+            present = self._connack(connack)
+        except:
+            self._close()
+            raise
+
+        self.conn_issue = None
+        self.last_ping = ticks_ms()
+        return present
+
+    ################
+    # background tasks
+
+    def _next_timer_ms(self):
+        now = ticks_ms()
+        wait = self.message_timeout * 1000
+        if self.keepalive:
+            wait = min(wait, ticks_diff(ticks_add(self.last_ping, self.keepalive * 500), now))
+        if self._dlh < len(self._dlq):
+            wait = min(wait, ticks_diff(self._dlq[self._dlh][1], now))
+        return max(wait, 0)
+
+    async def _timer(self):
+        while True:
+            await asyncio.sleep(self._next_timer_ms() / 1000)
+            self._message_timeout()
+            if self.msg_to_send or self.sub_to_send:
+                self.send_queue()
+            if self.keepalive and ticks_diff(ticks_ms(), self.last_ping) >= self.keepalive * 500:
+                robust2.MQTTClient.ping(self)
+            await self._drain()
+
+    async def _serve(self):
+        # Broker answers PINGREQ every keepalive/2 seconds,
+        # so silence longer than keepalive means a dead link.
+        timeout = self.keepalive or None
+        while True:
+            op, body = await self._recv_packet(timeout)
+            self._dispatch(op, body)
+            await self._drain()
+
+    async def _run(self):
+        delay = self.RECONNECT_DELAY
+
+        while self._running:
+            if self._writer is None:
+                try:
+                    await self._open(False)
+                except (OSError, EOFError, asyncio.TimeoutError, simple2.MQTTException) as e:
+                    self.conn_issue = e, 4
+                    self.log()
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.RECONNECT_DELAY_MAX)
+                    continue
+                delay = self.RECONNECT_DELAY
+                self._resubscribe()
+                self.send_queue()
+                await self._drain()
+
+            timer = asyncio.create_task(self._timer())
+            try:
+                await self._serve()
+            except (OSError, EOFError, asyncio.TimeoutError, simple2.MQTTException) as e:
+                self.conn_issue = e, 8
+                self.log()
+            finally:
+                timer.cancel()
+                self._close()
+
+    ################
+    # public API
+
+    def is_connected(self):
+        return self._writer is not None
+
+    async def connect(self, clean_session = True, retry = False):
+        """Connect to the broker and start the background tasks.
+        Raises if the first connection attempt fails, unless RETRY:
+        then the background task keeps trying (e.g. broker or Wi-Fi
+        down at boot) and None is returned.
+        """
+        try:
+            present = await self._open(clean_session)
+        except (OSError, EOFError, asyncio.TimeoutError, simple2.MQTTException) as e:
+            if not retry:
+                raise
+            self.conn_issue = e, 1
+            self.log()
+            present = None
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        return present
+
+    async def disconnect(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            try:
+                self._write(b'\xe0\x00')
+                await self._writer.drain()
+            except OSError:
+                pass
+        self._close()
+
+    async def publish(self, topic, msg, retain = False, qos = 0):
+        pid = super().publish(topic, msg, retain, qos)
+        await self._drain()
+        return pid
+
+    async def publish_many(self, msgs):
+        count = super().publish_many(msgs)
+        await self._drain()
+        return count
+
+    async def subscribe(self, topic, qos = 0, resubscribe = True):
+        pid = super().subscribe(topic, qos, resubscribe)
+        await self._drain()
+        return pid
+
+    def _resubscribe(self):
+        for topic, qos in self.subs:
+            robust2.MQTTClient.subscribe(self, topic, qos, False)
+
+    async def resubscribe(self):
+        self._resubscribe()
+        await self._drain()
+
+    async def ping(self):
+        super().ping()
+        await self._drain()
+
+    def check_msg(self):
+        # packets are received and dispatched by the background task;
+        # polling loops written for robust2 keep working
+        self._message_timeout()
+        return None
+
+    def wait_msg(self):
+        # blocking here would stall the event loop, including the
+        # background task that would deliver the message
+        raise RuntimeError('asyncmqtt delivers messages from its background task; '
+                           'await asyncio.sleep() instead of calling wait_msg()')
+
+    def set_callback(self, f):
+        super().set_callback(self._guard(f, 'callback'))
+
+    def set_callback_status(self, f):
+        super().set_callback_status(self._guard(f, 'status callback'))
+
+    def _guard(self, f, name):
+        # an exception from user code must not end the receive task
+        def call(*args):
+            try:
+                return f(*args)
+            except Exception as e:
+                print('MQTT %s error: %r' % (name, e))
+        return call
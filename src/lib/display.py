@@ -9,6 +9,9 @@
 #   Panel.fill(color)
 #   Panel.show()
 #   Panel.scroll(dy)
+#   Panel.blit565(data, x, y, w, h)     RGB565 image (batched text)
+#   Panel.vscroll_area(y, h)            hardware scroll area (console)
+#   Panel.vscroll_start(line)
 #
 # FBConsole() のための要件
 #  fill(self, color)                  画面をcolorで塗りつぶす (画面消去用)
@@ -21,9 +24,17 @@ class PinotDisplay:
     """
     Interface to small I2C display panel
     """
-    def __init__(self, panel = None, font = None):
+    def __init__(self, panel = None, font = None, batch = True, console = False):
         """
         Initialize a display.
+
+        If BATCH is true and the panel has blit565(), each text run
+        (up to a line) is composed into one RGB565 strip and sent
+        with a single window set and data write.
+
+        If CONSOLE is true and the panel has vscroll_area(), the
+        screen is a log: echo() appends a line, and scrolling is done
+        by the panel's scroll registers, clearing only the new line.
         """
         self.panel = panel
 
@@ -33,16 +44,49 @@ class PinotDisplay:
         self.cx = 0
         self.cy = 0
         self.top = 0
+        self.deferred = 0
+
+        # rows in use; a whole number of lines in console mode
+        self.height = panel.height if panel is not None else 0
+        self.console = False
+        if console and callable(getattr(panel, "vscroll_area", None)):
+            rows = panel.height // self.line_height * self.line_height
+            if panel.vscroll_area(0, rows):
+                self.console = True
+                self.height = rows
+
+        self.batch = batch and callable(getattr(panel, "blit565", None))
+        if self.batch:
+            from glyph565 import Glyph565
+            self.glyph565 = Glyph565()
+            self.strip = bytearray(0)
 
     def echo(self, msg, lineno = 0):
         print(msg)
         if self.panel is not None:
-            if lineno == 0:
+            if self.console:
+                if self.cx > 0:
+                    self.line_feed()
+            elif lineno == 0:
                 self.clear()
             # self.panel.text(msg, 0, lineno * 10, 1)
             self.text(msg)
-            if callable(getattr(self.panel, "show", None)):
-                self.panel.show()
+
+    def defer(self):
+        """
+        Hold back panel.show() until the matching flush(), so that
+        several echo()/text() calls end in one transfer.
+        """
+        self.deferred += 1
+
+    def flush(self):
+        if self.deferred > 0:
+            self.deferred -= 1
+        self.show()
+
+    def show(self):
+        if self.deferred == 0 and callable(getattr(self.panel, "show", None)):
+            self.panel.show()
 
     def banner(self, msg, lineno = 0):
         if self.panel is not None:
@@ -59,26 +103,31 @@ class PinotDisplay:
             self.panel.fill(0)
             self.cx = 0
             self.cy = 0
+            if self.console:
+                self.top = 0
+                self.panel.vscroll_start(0)
 
     def scroll(self, dy):
-        if callable(getattr(self.panel, "vscroll", None)):
+        if self.console:
+            self.panel.vscroll_start((self.top + dy) % self.height)
+        elif callable(getattr(self.panel, "vscroll", None)):
             self.panel.vscroll(dy)
         else:
             self.panel.scroll(dy, 0)
-        self.top = (self.top + dy) % self.panel.height
+        self.top = (self.top + dy) % self.height
 
     def absolute_y(self, cy):
-        return (self.panel.height - self.top + cy) % self.panel.height
+        return (self.height - self.top + cy) % self.height
 
     def line_feed(self):
         self.cx = 0
-        bottom = (self.cy + self.line_height * 2 - 1) % self.panel.height
+        bottom = (self.cy + self.line_height * 2 - 1) % self.height
 
         # if wrapped
         if self.absolute_y(bottom) < self.absolute_y(self.cy):
             self.scroll(self.absolute_y(bottom) + 1)
 
-        self.cy = (self.cy + self.line_height) % self.panel.height
+        self.cy = (self.cy + self.line_height) % self.height
         self.panel.fill_rect(0, self.cy,
                                   self.panel.width, self.line_height,
                                   0)
@@ -88,8 +137,10 @@ class PinotDisplay:
         self.cy = y
 
     def text(self, msg):
+        run = []
         for char in msg:
             if char == '\n':
+                self.__put_run(run)
                 self.line_feed()
                 continue
 
@@ -99,27 +150,80 @@ class PinotDisplay:
                 continue
 
             if self.cx + glyph.width >= self.panel.width:
+                self.__put_run(run)
                 self.line_feed()
 
-            self.__put_glyph(self.cx, self.cy, glyph)
+            if self.batch:
+                run.append(glyph)
+            else:
+                self.__put_glyph(self.cx, self.cy, glyph)
             self.cx += glyph.width
-        if callable(getattr(self.panel, "show", None)):
-            self.panel.show()
+        self.__put_run(run)
+        self.show()
 
-    def __put_glyph(self, sx, sy, glyph):
+    def put_text(self, x, y, msg, color = 0xffff, background = 0x0000):
+        """
+        Draw MSG at (X, Y) without moving the cursor, wrapping or
+        scrolling; glyphs past the right edge are dropped.
+        Return (width, height) of the drawn text.
+        """
+        run = []
+        width = 0
+        height = 0
+        for char in msg:
+            glyph = self.font.glyph(char)
+            if glyph is None:
+                continue
+            if x + width + glyph.width > self.panel.width:
+                break
+            if self.batch:
+                run.append(glyph)
+            else:
+                self.__put_glyph(x + width, y, glyph, color, background)
+            width += glyph.width
+            height = max(height, glyph.height)
+        self.__put_run(run, x, y, color, background)
+        self.show()
+        return width, height
+
+    def __put_run(self, run, sx = None, sy = None, color = 0xffff, background = 0x0000):
+        """Send glyphs of RUN as one strip at (SX, SY), or ending at
+        the cursor.
+        """
+        if not run:
+            return
+        width = 0
+        height = 0
+        for glyph in run:
+            width += glyph.width
+            height = max(height, glyph.height)
+        if len(self.strip) < width * height * 2:
+            self.strip = bytearray(self.panel.width * height * 2)
+        if sx is None:
+            sx, sy = self.cx - width, self.cy
+
+        x = 0
+        for glyph in run:
+            self.glyph565.expand_into(self.strip, width, x, height, glyph, color, background)
+            x += glyph.width
+        self.panel.blit565(memoryview(self.strip)[:width * height * 2],
+                           sx, sy, width, height)
+        run.clear()
+
+    def __put_glyph(self, sx, sy, glyph, color = 0xffff, background = 0x0000):
         if callable(getattr(self.panel, "glyph", None)):
-            self.panel.glyph(glyph, sx, sy)
+            self.panel.glyph(glyph, sx, sy, color, background)
         else:
             for y in range(0, glyph.height):
                 for x in range(0, glyph.width):
                     pix = glyph.pixel(x, y)
-                    self.panel.pixel(sx + x, sy + y, pix * 65535)
+                    self.panel.pixel(sx + x, sy + y, color if pix else background)
 
 ################################################################
 ## main
 
 if __name__ == '__main__':
-    from machine import Pin, SoftI2C
+    import i2cbus
     from ssd1306 import SSD1306_I2C
     from pnfont import Font
     import sys
@@ -128,7 +232,7 @@ if __name__ == '__main__':
         sys.argv[0] = re.sub(r'(-script\.pyw|\.exe)?$', '', sys.argv[0])
 
 
-    i2c  = SoftI2C(scl = Pin(22), sda = Pin(21))
+    i2c  = i2cbus.bus(scl = 22, sda = 21)
     disp = PinotDisplay(panel = SSD1306_I2C(128, 32, i2c, addr = 0x3c),
                         font  = Font('/fonts/shnmk14u.pfn'))
 
@@ -0,0 +1,168 @@
+import micropython
+
+# 1-bpp glyph bitmap to big-endian RGB565 pixels, shared by the
+# ili9341, ST7735 and st7789py drivers.
+#
+# A 256-entry table maps every bitmap byte to its 8 pixels (16 bytes)
+# in the current fg/bg colors; it is rebuilt only when the colors
+# change.  Pixels are written into one preallocated output buffer.
+#
+# Expanded glyphs are kept in a RenderCache shared by all panels, so
+# redrawing the same text is a straight blit.
+
+FORMAT = 'rgb565'   # big-endian RGB565, as sent to the panels
+
+def _expand_py(out, lut, bitmap, npix):
+    full = npix >> 3
+    o = 0
+    for i in range(full):
+        src = bitmap[i] << 4
+        out[o:o + 16] = lut[src:src + 16]
+        o += 16
+    rest = (npix & 7) << 1
+    if rest:
+        src = bitmap[full] << 4
+        out[o:o + rest] = lut[src:src + rest]
+
+try:
+    @micropython.viper
+    def _expand_viper(out: ptr8, lut: ptr8, bitmap: ptr8, npix: int):
+        full = npix >> 3
+        o = 0
+        for i in range(full):
+            src = int(bitmap[i]) << 4
+            for k in range(16):
+                out[o + k] = lut[src + k]
+            o += 16
+        rest = (npix & 7) << 1
+        if rest:
+            src = int(bitmap[full]) << 4
+            for k in range(rest):
+                out[o + k] = lut[src + k]
+    _expand = _expand_viper
+except (NameError, AttributeError):
+    # no viper (e.g. host Python)
+    _expand = _expand_py
+
+class RenderCache:
+    """LRU cache of rendered glyphs keyed by (codepoint, fg, bg, format)
+    and glyph size, bounded by BUDGET bytes of pixel data.
+    """
+
+    def __init__(self, budget = 8192):
+        self.budget = budget
+        self.cache = {}         # key -> [pixels, last use]
+        self.used = 0
+        self.clock = 0
+        self.hits, self.misses = 0, 0
+
+    def get(self, key):
+        self.clock += 1
+        entry = self.cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry[1] = self.clock
+        return entry[0]
+
+    def put(self, key, pixels):
+        size = len(pixels)
+        if size > self.budget:
+            return
+        while self.cache and self.used + size > self.budget:
+            lru, oldest = None, None
+            for k, entry in self.cache.items():
+                if oldest is None or entry[1] < oldest:
+                    lru, oldest = k, entry[1]
+            self.used -= len(self.cache.pop(lru)[0])
+        self.cache[key] = [pixels, self.clock]
+        self.used += size
+
+    def clear(self):
+        self.cache = {}
+        self.used = 0
+        self.hits, self.misses = 0, 0
+
+    def info(self):
+        """Return (hits, misses, entries, bytes).
+        """
+        return self.hits, self.misses, len(self.cache), self.used
+
+# shared by all panel drivers; set budget = 0 to disable
+render_cache = RenderCache()
+
+class Glyph565:
+    """Expand pnfont.Glyph bitmaps to RGB565.
+
+    >>> expander = Glyph565()
+    >>> data = expander.expand(glyph, 0xffff, 0x0000)
+    >>> panel.blit_buffer(data, x, y, glyph.width, glyph.height)
+
+    The returned buffer is only valid until the next expand().
+    Results are looked up in and added to CACHE (render_cache by
+    default; None disables caching).
+    """
+
+    def __init__(self, cache = render_cache):
+        self.lut = bytearray(256 * 16)
+        self.lut_mv = memoryview(self.lut)
+        self.colors = None
+        self.buf = bytearray(0)
+        self.cache = cache
+
+    def set_colors(self, color, background):
+        if self.colors == (color, background):
+            return
+        self.colors = (color, background)
+        fg1, fg2 = color >> 8 & 0xff, color & 0xff
+        bg1, bg2 = background >> 8 & 0xff, background & 0xff
+        lut = self.lut
+        for b in range(256):
+            o = b << 4
+            for k in range(8):
+                if b & (0x80 >> k):
+                    lut[o], lut[o + 1] = fg1, fg2
+                else:
+                    lut[o], lut[o + 1] = bg1, bg2
+                o += 2
+
+    def expand(self, glyph, color = 0xffff, background = 0x0000):
+        """Return RGB565 pixels of GLYPH (width * height * 2 bytes).
+        """
+        cache = self.cache
+        if cache is not None and cache.budget > 0:
+            key = (ord(glyph.char), color, background, FORMAT, glyph.width, glyph.height)
+            pixels = cache.get(key)
+            if pixels is not None:
+                return pixels
+
+        self.set_colors(color, background)
+        npix = glyph.width * glyph.height
+        if len(self.buf) < npix * 2:
+            self.buf = bytearray(npix * 2)
+        _expand(self.buf, self.lut_mv, glyph.bitmap, npix)
+        pixels = memoryview(self.buf)[:npix * 2]
+
+        if cache is not None and cache.budget > 0:
+            pixels = bytes(pixels)
+            cache.put(key, pixels)
+        return pixels
+
+    def expand_into(self, strip, stride, x, rows, glyph, color = 0xffff, background = 0x0000):
+        """Expand GLYPH into STRIP, an RGB565 image STRIDE pixels wide and
+        ROWS high, with its left edge at column X.  Rows below a short
+        glyph are filled with BACKGROUND.
+        """
+        pixels = memoryview(self.expand(glyph, color, background))
+        w2, s2 = glyph.width * 2, stride * 2
+        o, i = x * 2, 0
+        for _ in range(min(rows, glyph.height)):
+            strip[o:o + w2] = pixels[i:i + w2]
+            o += s2
+            i += w2
+        if glyph.height < rows:
+            blank = bytes([background >> 8 & 0xff, background & 0xff]) * glyph.width
+            for _ in range(rows - glyph.height):
+                strip[o:o + w2] = blank
+                o += s2
@@ -0,0 +1,143 @@
+# Time-series chart of one SampleRing field, updated column by column.
+#
+# The chart is a sweep: each new sample is drawn in the next column
+# and a blank gap column ahead of it marks the write position, like
+# a patient monitor.  An update therefore sends two 1-pixel-wide
+# columns (2 * height * 2 bytes on RGB565 panels) instead of the
+# whole chart.  The panels' hardware scroll is vertical and spans
+# the full width, so it cannot shift a chart sideways.
+#
+#   ring = SampleRing(240, (('co2', 'H'), ('temperature', 'f'), ('humidity', 'f')))
+#   graph = TrendGraph(panel, 0, 40, 240, 100, ring, 'co2', 400, 2000, marks = (1000,))
+#   ring.append(812, 24.8, 41.0)
+#   graph.update()
+
+class TrendGraph:
+    """
+    Chart of the newest samples of NAME in RING at (X, Y, WIDTH,
+    HEIGHT), scaled to LO..HI.  The range grows (with a full redraw)
+    when a sample falls outside it, unless FIXED.  MARKS are values
+    drawn as dotted lines (e.g. CO2 alarm thresholds).
+    """
+    def __init__(self, panel, x, y, width, height, ring, name, lo, hi,
+                 color = 0x07e0, background = 0x0000, mark_color = 0x8410,
+                 marks = (), fixed = False):
+        self.panel = panel
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.ring = ring
+        self.name = name
+        self.lo = lo
+        self.hi = hi
+        self.color = color
+        self.background = background
+        self.mark_color = mark_color
+        self.marks = marks
+        self.fixed = fixed
+
+        self.rgb565 = callable(getattr(panel, "blit565", None))
+        if self.rgb565:
+            self.blank = bytes([background >> 8 & 0xff, background & 0xff]) * height
+            self.column = bytearray(self.blank)
+        self.pos = 0            # column of the next sample
+        self.prev = None        # row of the previous sample
+        self.stale = True       # needs redraw()
+        self.drawn = 0          # ring appends seen so far
+
+    def invalidate(self):
+        """Redraw everything on the next update() (e.g. after a clear).
+        """
+        self.stale = True
+
+    def row(self, value):
+        """Row (0 = top) of VALUE in the chart.
+        """
+        value = min(max(value, self.lo), self.hi)
+        span = max(self.hi - self.lo, 1)
+        return self.height - 1 - int((value - self.lo) * (self.height - 1) / span + 0.5)
+
+    def fit(self, value):
+        """Grow LO..HI to include VALUE; return True if changed.
+        """
+        if self.fixed or self.lo <= value <= self.hi:
+            return False
+        margin = (self.hi - self.lo) // 10 or 1
+        if value > self.hi:
+            self.hi = value + margin
+        else:
+            self.lo = value - margin
+        return True
+
+    def update(self):
+        """Draw samples appended to the ring since the last call.
+        """
+        ring = self.ring
+        new = ring.total - self.drawn
+        if self.stale or new < 0 or new > 1:
+            # cleared or several samples behind; redraw from the ring
+            return self.redraw()
+        if new == 0:
+            return
+        value = ring.last(self.name)
+        if self.fit(value):
+            return self.redraw()
+        self.put(value)
+        self.drawn = ring.total
+
+    def redraw(self):
+        """Redraw the chart from the ring.
+        """
+        self.pos, self.prev = 0, None
+        n = min(len(self.ring), self.width - 1)
+        if not self.fixed:
+            for value in self.ring.window(self.name, n):
+                self.fit(value)
+        # columns written by put() need no clearing
+        self.panel.fill_rect(self.x + n, self.y, self.width - n, self.height, self.background)
+        for value in self.ring.window(self.name, n):
+            self.put(value, False)
+        self.stale = False
+        self.drawn = self.ring.total
+
+    def put(self, value, gap = True):
+        """Draw VALUE in the current column and advance (with GAP, also
+        blank the column ahead).
+        """
+        y = self.row(value)
+        top, bottom = y, y
+        if self.prev is not None and self.pos > 0:
+            # join the previous sample unless wrapping to the left edge
+            top, bottom = min(y, self.prev), max(y, self.prev)
+        self.prev = y
+
+        x = self.x + self.pos
+        if self.rgb565:
+            column = self.column
+            column[:] = self.blank
+            c1, c2 = self.mark_color >> 8 & 0xff, self.mark_color & 0xff
+            for mark in self.marks:
+                if self.lo <= mark <= self.hi and self.pos & 1 == 0:
+                    r = self.row(mark) * 2
+                    column[r], column[r + 1] = c1, c2
+            c1, c2 = self.color >> 8 & 0xff, self.color & 0xff
+            for r in range(top * 2, bottom * 2 + 2, 2):
+                column[r], column[r + 1] = c1, c2
+            self.panel.blit565(column, x, self.y, 1, self.height)
+        else:
+            self.panel.fill_rect(x, self.y, 1, self.height, self.background)
+            for mark in self.marks:
+                if self.lo <= mark <= self.hi and self.pos & 1 == 0:
+                    self.panel.fill_rect(x, self.y + self.row(mark), 1, 1, self.mark_color)
+            self.panel.fill_rect(x, self.y + top, 1, bottom - top + 1, self.color)
+
+        self.pos = (self.pos + 1) % self.width
+        if not gap:
+            return
+        # blank column ahead of the newest sample
+        x = self.x + self.pos
+        if self.rgb565:
+            self.panel.blit565(self.blank, x, self.y, 1, self.height)
+        else:
+            self.panel.fill_rect(x, self.y, 1, self.height, self.background)
@@ -0,0 +1,125 @@
+# Shared I2C bus for the SSD1306, SCD30, SHT31 and BH1750 drivers.
+#
+# A bus is created once per pin pair and boot:
+#   - hardware I2C is used while a controller is free (ESP32 has two),
+#     SoftI2C otherwise or when a device stretches the clock longer
+#     than the hardware timeout allows (see STRETCH),
+#   - the bus is scanned once at 100kHz, and the result is kept,
+#   - the clock is then raised to the fastest rate every device found
+#     tolerates (see MAX_FREQ).
+#
+# I2CBus has the methods of machine.I2C that the drivers use, so it
+# can be passed wherever an I2C object is expected:
+#
+#   import i2cbus
+#   i2c = i2cbus.bus(scl = 22, sda = 21)
+#   panel = SSD1306_I2C(128, 32, i2c, 0x3c)
+#   sensor = SCD30(i2c, 0x61)       # i2c.scan() is not repeated
+
+from machine import Pin, I2C, SoftI2C
+
+HARDWARE_BUSES = 2
+SCAN_FREQ = 100000
+DEFAULT_FREQ = 100000   # for devices not in MAX_FREQ
+
+# Fastest bus clock of each known device address (Hz)
+MAX_FREQ = {
+    0x3c: 400000,       # SSD1306
+    0x3d: 400000,
+    0x61: 100000,       # SCD30 (stretches clock up to 150ms)
+    0x44: 1000000,      # SHT31
+    0x45: 1000000,
+    0x23: 400000,       # BH1750
+    0x5c: 400000,
+}
+
+# The ESP32 controller caps its timeout at about 13ms (larger values
+# are clamped silently); SoftI2C honours the full timeout.
+HARDWARE_TIMEOUT_MAX = 13000    # us
+
+# Longest clock stretch of known device addresses (us)
+STRETCH = {
+    0x61: 150000,       # SCD30
+}
+
+def negotiate(devices):
+    """Return the fastest clock that all DEVICES tolerate.
+    """
+    freq = None
+    for addr in devices:
+        limit = MAX_FREQ.get(addr, DEFAULT_FREQ)
+        if freq is None or limit < freq:
+            freq = limit
+    return freq or DEFAULT_FREQ
+
+class I2CBus:
+    """
+    I2C bus on SCL/SDA pins with a cached scan.
+    """
+    def __init__(self, scl, sda, id = None, freq = None, timeout = 200000):
+        """
+        Open hardware I2C ID (or SoftI2C if ID is None or fails) and
+        scan it.  FREQ overrides the negotiated clock.  TIMEOUT (us)
+        is capped at HARDWARE_TIMEOUT_MAX on hardware I2C.
+        """
+        self.scl = scl
+        self.sda = sda
+        self.id = id
+        self.timeout = timeout
+
+        self.open(SCAN_FREQ)
+        self.devices = self.i2c.scan()
+        if freq is None:
+            freq = negotiate(self.devices)
+        stretch = max([STRETCH.get(addr, 0) for addr in self.devices] + [0])
+        if self.hardware and stretch > HARDWARE_TIMEOUT_MAX:
+            # SoftI2C waits out the stretch; the controller would not
+            self.id = None
+            self.open(freq)
+        elif freq != SCAN_FREQ:
+            self.open(freq)
+        print("I2C bus:", "hardware" if self.hardware else "soft", freq, [hex(a) for a in self.devices])
+
+    def open(self, freq):
+        i2c = None
+        if self.id is not None:
+            try:
+                i2c = I2C(self.id, scl = Pin(self.scl), sda = Pin(self.sda),
+                          freq = freq, timeout = min(self.timeout, HARDWARE_TIMEOUT_MAX))
+            except (ValueError, TypeError, OSError):
+                i2c = None
+        self.hardware = i2c is not None
+        if i2c is None:
+            i2c = SoftI2C(scl = Pin(self.scl), sda = Pin(self.sda),
+                          freq = freq, timeout = self.timeout)
+        self.i2c = i2c
+        self.freq = freq
+
+        # bound once; no lookup overhead per transaction
+        self.readfrom = i2c.readfrom
+        self.readfrom_into = i2c.readfrom_into
+        self.writeto = i2c.writeto
+        self.writevto = i2c.writevto
+        self.readfrom_mem = i2c.readfrom_mem
+        self.readfrom_mem_into = i2c.readfrom_mem_into
+        self.writeto_mem = i2c.writeto_mem
+
+    def scan(self):
+        """Return addresses found at boot, without probing the bus.
+        """
+        return list(self.devices)
+
+    def rescan(self):
+        self.devices = self.i2c.scan()
+        return self.scan()
+
+_buses = {}
+
+def bus(scl = 22, sda = 21, freq = None):
+    """Return the shared I2CBus on SCL/SDA, creating it on first use.
+    """
+    key = (scl, sda)
+    if key not in _buses:
+        id = len(_buses) if len(_buses) < HARDWARE_BUSES else None
+        _buses[key] = I2CBus(scl, sda, id, freq)
+    return _buses[key]
@@ -2,7 +2,8 @@
 
 import time
 import ustruct
-import framebuf
+from glyph565 import Glyph565
+from spitransport import SPITransport
 
 _COLUMN_SET = const(0x2a)
 _PAGE_SET = const(0x2b)
@@ -11,6 +12,7 @@ _RAM_READ = const(0x2e)
 _DISPLAY_ON = const(0x29)
 _WAKE = const(0x11)
 _LINE_SET = const(0x37)
+_SCROLL_DEF = const(0x33)
 _MADCTL = const(0x36)
 _DISPLAY_INVERSION_ON = const(0x21)
 
@@ -39,9 +41,11 @@ class ILI934X:
         self.cs.init(self.cs.OUT, value=1)
         self.dc.init(self.dc.OUT, value=0)
         self.rst.init(self.rst.OUT, value=0)
+        self._transport = SPITransport(spi, cs, dc, _COLUMN_SET, _PAGE_SET, _RAM_WRITE)
         self.reset()
         self.init()
         self._scroll = 0
+        self._glyph565 = Glyph565()
 
     def init(self):
         for command, data in (
@@ -80,35 +84,21 @@ class ILI934X:
         time.sleep_ms(50)
 
     def _write(self, command, data=None):
-        self.dc.value(0)
-        self.cs.value(0)
-        self.spi.write(bytearray([command]))
-        self.cs.value(1)
-        if data is not None:
-            self._data(data)
+        self._transport.command(command, data)
 
     def _data(self, data):
         if data is not None and len(data) > 0:
-            self.dc.value(1)
-            self.cs.value(0)
-            self.spi.write(data)
-            self.cs.value(1)
+            self._transport.data(data)
 
     def _block(self, x0, y0, x1, y1, data=None):
-        self._write(_COLUMN_SET, ustruct.pack(">HH", x0, x1))
-        self._write(_PAGE_SET, ustruct.pack(">HH", y0, y1))
         if data is None:
+            self._write(_COLUMN_SET, ustruct.pack(">HH", x0, x1))
+            self._write(_PAGE_SET, ustruct.pack(">HH", y0, y1))
             return self._read(_RAM_READ, (x1 - x0 + 1) * (y1 - y0 + 1) * 3)
-        self._write(_RAM_WRITE, data)
+        self._transport.write_window(x0, y0, x1, y1, data)
 
     def _read(self, command, count):
-        self.dc.value(0)
-        self.cs.value(0)
-        self.spi.write(bytearray([command]))
-        dummy = self.spi.read(1)
-        data = self.spi.read(count)
-        self.cs.value(1)
-        return data
+        return self._transport.read(command, count)
 
     def pixel(self, x, y, color=None):
         if color is None:
@@ -116,26 +106,20 @@ class ILI934X:
             return color565(r, g, b)
         if not 0 <= x < self.width or not 0 <= y < self.height:
             return
-        self._block(x, y, x, y, ustruct.pack(">H", color))
+        self._transport.pixel(x, y, color)
 
     def fill_rect(self, x, y, w, h, color):
         x = min(self.width - 1, max(0, x))
         y = min(self.height - 1, max(0, y))
         w = min(self.width - x, max(1, w))
         h = min(self.height - y, max(1, h))
-        self._block(x, y, x + w - 1, y + h - 1, b'')
-        chunks, rest = divmod(w * h, 512)
-        if chunks:
-            data = ustruct.pack(">H", color) * 512
-            for count in range(chunks):
-                self._data(data)
-        data = ustruct.pack(">H", color) * rest
-        self._data(data)
+        self._transport.fill_window(x, y, x + w - 1, y + h - 1, color)
 
     def fill(self, color):
         self.fill_rect(0, 0, self.width, self.height, color)
 
     def char(self, char, x, y, color=0xffff, background=0x0000):
+        import framebuf
         buffer = bytearray(8)
         framebuffer = framebuf.FrameBuffer1(buffer, 8, 8)
         framebuffer.text(char, 0, 0)
@@ -153,38 +137,12 @@ class ILI934X:
         self._block(x, y, x + 7, y + 7, data)
 
     def glyph(self, glyph, x, y, color=0xffff, background=0x0000):
-        fg1, fg2 = ustruct.pack(">H", color)
-        bg1, bg2  = ustruct.pack(">H", background)
-        data = bytearray()
-        for b in glyph.bitmap:
-            p0 = (b >> 7) & 1
-            p1 = (b >> 6) & 1
-            p2 = (b >> 5) & 1
-            p3 = (b >> 4) & 1
-            p4 = (b >> 3) & 1
-            p5 = (b >> 2) & 1
-            p6 = (b >> 1) & 1
-            p7 = (b >> 0) & 1
-            data.extend(bytearray([
-                fg1 * p0 + bg1 * (1 - p0),
-                fg2 * p0 + bg2 * (1 - p0),
-                fg1 * p1 + bg1 * (1 - p1),
-                fg2 * p1 + bg2 * (1 - p1),
-                fg1 * p2 + bg1 * (1 - p2),
-                fg2 * p2 + bg2 * (1 - p2),
-                fg1 * p3 + bg1 * (1 - p3),
-                fg2 * p3 + bg2 * (1 - p3),
-                fg1 * p4 + bg1 * (1 - p4),
-                fg2 * p4 + bg2 * (1 - p4),
-                fg1 * p5 + bg1 * (1 - p5),
-                fg2 * p5 + bg2 * (1 - p5),
-                fg1 * p6 + bg1 * (1 - p6),
-                fg2 * p6 + bg2 * (1 - p6),
-                fg1 * p7 + bg1 * (1 - p7),
-                fg2 * p7 + bg2 * (1 - p7)
-            ]))
+        data = self._glyph565.expand(glyph, color, background)
         self._block(x, y, x + glyph.width -1, y + glyph.height - 1, data)
 
+    def blit565(self, data, x, y, w, h):
+        self._block(x, y, x + w - 1, y + h - 1, data)
+
     def text(self, text, x, y, color=0xffff, background=0x0000, wrap=None,
              vwrap=None, clear_eol=False):
         if wrap is None:
@@ -221,5 +179,22 @@ class ILI934X:
         self._scroll = (self._scroll + dy) % self.height
         self._write(_LINE_SET, ustruct.pack('>H', self._scroll))
 
+    def vscrdef(self, tfa, vsa, bfa):
+        self._write(_SCROLL_DEF, ustruct.pack(">HHH", tfa, vsa, bfa))
+
+    def vscsad(self, vssa):
+        self._scroll = vssa
+        self._write(_LINE_SET, ustruct.pack('>H', vssa))
+
+    def vscroll_area(self, y, height):
+        # rows Y..Y+HEIGHT-1 scroll; the rest stays fixed
+        self._vscroll_top = y
+        self.vscrdef(y, height, self.height - y - height)
+        return True
+
+    def vscroll_start(self, line):
+        # show row Y+LINE at the top of the scroll area
+        self.vscsad(self._vscroll_top + line)
+
     def show(self):
         pass
@@ -5,7 +5,7 @@
 # from umqtt.robust import MQTTClient
 from umqtt.robust2 import MQTTClient
 
-def mqtt_create_client(config):
+def mqtt_create_client(config, client_class = MQTTClient):
     client_name = config.get('mqtt_client_name') # 'esp32client'
     broker_name = config.get('mqtt_broker_name') # 'mqtt.beebotte.com'
     user        = config.get('mqtt_user') # 'token_XXXXXXXXXXXXXXXX'
@@ -13,7 +13,7 @@ def mqtt_create_client(config):
     pub_topic   = config.get('mqtt_pub_topic') # 'doorplate/lux'
 
     # mqtt = MQTTClient(client_name, broker_name, user = user, password = password, port = 8883, ssl = True)
-    mqtt = MQTTClient(client_name, broker_name, user = user, password = password, keepalive=60)
+    mqtt = client_class(client_name, broker_name, user = user, password = password, keepalive=60)
     # Print diagnostic messages when retries/reconnects happens
     mqtt.DEBUG = True
     # Information whether we store unsent messages with the flag QoS==0 in the queue.
@@ -26,6 +26,12 @@ def mqtt_create_client(config):
     mqtt.RESUBSCRIBE = True
     return mqtt
 
+def mqtt_create_async_client(config):
+    # asyncio version: await connect()/publish()/subscribe(),
+    # callbacks are fired from the background receive task.
+    from asyncmqtt import MQTTClient as AsyncMQTTClient
+    return mqtt_create_client(config, AsyncMQTTClient)
+
 if __name__ == '__main__':
     from jsonconfig import JsonConfig
     import time
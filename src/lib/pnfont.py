@@ -1,4 +1,5 @@
-from struct import unpack
+from array import array
+from struct import unpack, unpack_from
 
 # 1st byte mask:
 # | 1st byte            | prefix mask      | value mask       |
@@ -37,6 +38,32 @@ def utf8_to_code234(b1, b234):
         code = (code << 6) | (bx & 0x3f)
     return code
 
+def decode_bitmap(src, length, raw_size, width, scratch):
+    """Decode PFN v2 bitmap SRC[:LENGTH] (see scripts/makepfn).
+    SCRATCH is a bytearray of at least RAW_SIZE bytes.
+    """
+    if length == raw_size:
+        return bytes(src[:length])
+
+    j = (raw_size + 7) // 8
+    for i in range(raw_size):
+        if src[i >> 3] & (0x80 >> (i & 7)):
+            scratch[i] = src[j]
+            j += 1
+        else:
+            scratch[i] = 0
+
+    # undo XOR of each row with the row above
+    x = int.from_bytes(memoryview(scratch)[:raw_size], 'big')
+    n, shift = raw_size * 8, width
+    while shift < n:
+        x ^= x >> shift
+        shift <<= 1
+    return x.to_bytes(raw_size, 'big')
+
+# Header version bit: block directory follows the font header
+DIRECTORY = 0x80
+
 def codepoint_to_size(codepoint):
     if codepoint <= 0xff:
         return 1
@@ -46,38 +73,234 @@ def codepoint_to_size(codepoint):
         return 4
 
 class Font:
-    def __init__(self, font_filename):
+    def __init__(self, font_filename, cache_size = 64, cache_bytes = 4096, mode = 'file', blocks = None):
+        """Open PFN font FONT_FILENAME.
+        Up to CACHE_SIZE recently used glyphs (and at most CACHE_BYTES
+        of bitmaps) are kept in RAM; CACHE_SIZE = 0 disables the cache.
+
+        MODE selects the memory/latency trade-off of a lookup:
+          'file':  bisect on the file (a seek+read per step),
+                   the file is opened per lookup; no extra RAM
+          'index': codepoints of every block are kept in RAM
+                   (about 2 bytes per glyph) and the file stays open;
+                   a lookup is one seek+read of the bitmap
+          'resident': the whole font, or only the BLOCKS (list of block
+                   numbers) given, is loaded into one bytearray and
+                   Glyph.bitmap is a memoryview into it; no file I/O
+                   after construction
+
+        Both PFN version 1 and 2 are read.  For version 2 the group
+        table (about 0.6 bytes per glyph) is always kept in RAM, and
+        bitmaps are decoded with two fixed scratch buffers.
+        """
         self.font_filename = font_filename
         self.block_headers = []
+        self.mode = mode
+        self.indexes = []       # per block codepoint array (mode 'index')
+        self.fp = None
+        self.data = None        # font image (mode 'resident')
+        self.groups = []        # per block group table (PFN v2)
+
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self.cache = {}         # codepoint -> [glyph, last use]
+        self.cache_used = 0     # bitmap bytes in cache
+        self.cache_clock = 0
+        self.hits, self.misses = 0, 0
 
         with open(self.font_filename, 'rb') as fp:
-            fp.seek(16) # Skip header
+            # header and block directory in one read
+            head = fp.read(256)
+            self.version = head[7] & 0x7f
             pos = 16
 
-            while True:
-                block_header = fp.read(6)
+            if head[7] & DIRECTORY:
+                num_blocks, = unpack_from('<H', head, 16)
+                pos = 20 + 20 * num_blocks
+                if len(head) < pos:
+                    fp.seek(len(head))
+                    head += fp.read(pos - len(head))
+                if self.version == 1:
+                    self.load_directory(fp, head, num_blocks)
 
-                if len(block_header) != 6:
-                    break
+            if not self.block_headers:
+                fp.seek(pos)
+                if self.version == 2:
+                    self.walk_blocks_v2(fp, pos)
+                else:
+                    self.walk_blocks(fp, pos)
+
+        if self.version == 2:
+            raw_size = max([(w * h + 7) // 8 for _, _, _, _, _, w, h in self.block_headers] + [0])
+            self.scratch = bytearray(raw_size)
+            self.packed = bytearray(raw_size)
+            self.records = bytearray(32)
+
+        if mode == 'index':
+            self.fp = open(self.font_filename, 'rb')
+        elif mode == 'resident':
+            self.load_resident(blocks)
+
+    def load_directory(self, fp, head, num_blocks):
+        """Build block_headers of PFN v1 from the block directory.
+        """
+        for i in range(20, 20 + 20 * num_blocks, 20):
+            head_codepoint, tail_codepoint, offset, num_chars, width, height, codepoint_size = \
+                unpack_from('<IIIHBBB', head, i)
+            entry_size = (width * height + 7) // 8 + codepoint_size
+            head_pos = offset + 6
+            tail_pos = head_pos + entry_size * (num_chars - 1)
+
+            if self.mode == 'index':
+                self.indexes.append(self.load_index(fp, head_pos, num_chars, entry_size, codepoint_size))
 
-                width, height, codepoint_size, attribute, num_chars = \
-                    unpack('<BBBBH', block_header)
-                pos += 6
-                entry_size = (width * height + 7) // 8 + codepoint_size
+            self.block_headers.append([head_codepoint, tail_codepoint, head_pos, tail_pos, entry_size, width, height])
+
+    def walk_blocks(self, fp, pos):
+        """Read PFN v1 block headers from POS to the end of file.
+        """
+        while True:
+            block_header = fp.read(6)
 
-                head = pos
-                tail = head + entry_size * (num_chars - 1)
+            if len(block_header) != 6:
+                break
 
-                label = '<' + '?BH?I'[codepoint_size]
+            width, height, codepoint_size, attribute, num_chars = \
+                unpack('<BBBBH', block_header)
+            pos += 6
+            entry_size = (width * height + 7) // 8 + codepoint_size
 
+            head = pos
+            tail = head + entry_size * (num_chars - 1)
+
+            label = '<' + '?BH?I'[codepoint_size]
+
+            if self.mode == 'index':
+                index = self.load_index(fp, head, num_chars, entry_size, codepoint_size)
+                self.indexes.append(index)
+                head_codepoint, tail_codepoint = index[0], index[-1]
+            else:
                 head_codepoint, = unpack(label, fp.read(codepoint_size))
                 fp.seek(tail)
                 tail_codepoint, = unpack(label ,fp.read(codepoint_size))
 
-                fp.seek(tail + entry_size)
-                pos = tail + entry_size
+            fp.seek(tail + entry_size)
+            pos = tail + entry_size
+
+            self.block_headers.append([head_codepoint, tail_codepoint, head, tail, entry_size, width, height])
+
+    def walk_blocks_v2(self, fp, pos):
+        """Read PFN v2 block headers and group tables from POS to the
+        end of file.
+        """
+        while True:
+            block_header = fp.read(12)
+
+            if len(block_header) != 12:
+                break
+
+            width, height, flags, attribute, num_glyphs, num_groups, data_size = \
+                unpack('<BBBBHHI', block_header)
+            table_pos = pos + 12 + 10 * num_groups
+            data_pos = table_pos + 2 * num_glyphs
+
+            cps, offsets, starts = array('I'), array('I'), array('H')
+            groups = fp.read(10 * num_groups)
+            for i in range(0, 10 * num_groups, 10):
+                codepoint, offset, start = unpack_from('<IIH', groups, i)
+                cps.append(codepoint)
+                offsets.append(offset)
+                starts.append(start)
+            self.groups.append((cps, offsets, starts, num_glyphs))
+
+            fp.seek(table_pos + 2 * starts[-1])
+            records = fp.read(2 * (num_glyphs - starts[-1]))
+            tail_codepoint = cps[-1]
+            for i in range(0, len(records), 2):
+                tail_codepoint += records[i]
 
-                self.block_headers.append([head_codepoint, tail_codepoint, head, tail, entry_size, width, height])
+            fp.seek(data_pos + data_size)
+            pos = data_pos + data_size
+
+            self.block_headers.append([cps[0], tail_codepoint, table_pos, data_pos, data_size, width, height])
+
+    def block_span(self, block_header):
+        """Return (position, length) of the block body in the file.
+        """
+        if self.version == 2:
+            table_pos, data_pos, data_size = block_header[2:5]
+            return table_pos, data_pos + data_size - table_pos
+        head, tail, entry_size = block_header[2:5]
+        return head, tail + entry_size - head
+
+    def load_resident(self, blocks = None):
+        """Read BLOCKS (all if None) into RAM; other blocks are dropped.
+        Block head/tail positions become offsets into self.data.
+        """
+        if blocks is not None:
+            blocks = sorted(blocks)
+            self.block_headers = [self.block_headers[i] for i in blocks]
+            if self.groups:
+                self.groups = [self.groups[i] for i in blocks]
+
+        size = sum(self.block_span(block_header)[1] for block_header in self.block_headers)
+        self.data = bytearray(size)
+        mv = memoryview(self.data)
+
+        offset = 0
+        with open(self.font_filename, 'rb') as fp:
+            for block_header in self.block_headers:
+                pos, length = self.block_span(block_header)
+                fp.seek(pos)
+                fp.readinto(mv[offset:offset + length])
+                block_header[2] += offset - pos
+                block_header[3] += offset - pos
+                offset += length
+
+    def resident_size(self):
+        """Bytes of RAM used by the font image (mode 'resident').
+        """
+        return len(self.data) if self.data is not None else 0
+
+    def load_index(self, fp, head, num_chars, entry_size, codepoint_size, chunk = 64):
+        """Read codepoint column of a block into an array.
+        """
+        index = array('?BH?I'[codepoint_size])
+        label = '<' + '?BH?I'[codepoint_size]
+        fp.seek(head)
+        while len(index) < num_chars:
+            n = min(chunk, num_chars - len(index))
+            entries = fp.read(entry_size * n)
+            for i in range(0, entry_size * n, entry_size):
+                index.append(unpack(label, entries[i:i + codepoint_size])[0])
+        return index
+
+    def index_size(self):
+        """Bytes of RAM used by the codepoint index.
+        """
+        return sum(len(index) * (block_header[4] - (block_header[5] * block_header[6] + 7) // 8)
+                   for index, block_header in zip(self.indexes, self.block_headers)) + \
+            sum(len(group[0]) * 10 for group in self.groups)
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+    def find_block(self, codepoint):
+        """Return index of the block that may contain CODEPOINT, or None.
+        """
+        block_headers = self.block_headers
+        head, tail = 0, len(block_headers) - 1
+        while head <= tail:
+            mid = (head + tail) // 2
+            if codepoint < block_headers[mid][0]:
+                tail = mid - 1
+            elif codepoint > block_headers[mid][1]:
+                head = mid + 1
+            else:
+                return mid
+        return None
 
     def glyph(self, char):
         """Find font Glyph by UTF-8 char
@@ -88,22 +311,167 @@ class Font:
         if codepoint is None:
             return None
 
-        with open(self.font_filename, 'rb') as fp:
-            for block_header in self.block_headers:
-                head_codepoint, tail_codepoint, head, tail, entry_size, width, height = block_header
-                if codepoint < head_codepoint:
-                    return None
-                elif tail_codepoint < codepoint:
-                    continue
-                else:
-                    break
+        if self.cache_size > 0:
+            self.cache_clock += 1
+            entry = self.cache.get(codepoint)
+            if entry is not None:
+                self.hits += 1
+                entry[1] = self.cache_clock
+                return entry[0]
+            self.misses += 1
+            glyph = self.load_glyph(char, codepoint)
+            self.cache_put(codepoint, glyph)
+            return glyph
+
+        return self.load_glyph(char, codepoint)
+
+    def cache_put(self, codepoint, glyph):
+        """Add GLYPH (None for a missing glyph) to the cache,
+        evicting least recently used ones to fit the budget.
+        """
+        size = len(glyph.bitmap) if glyph is not None else 0
+        if size > self.cache_bytes:
+            return
+        while self.cache and (len(self.cache) >= self.cache_size or
+                              self.cache_used + size > self.cache_bytes):
+            lru, oldest = None, None
+            for code, entry in self.cache.items():
+                if oldest is None or entry[1] < oldest:
+                    lru, oldest = code, entry[1]
+            victim = self.cache.pop(lru)[0]
+            if victim is not None:
+                self.cache_used -= len(victim.bitmap)
+        self.cache[codepoint] = [glyph, self.cache_clock]
+        self.cache_used += size
+
+    def cache_clear(self):
+        self.cache = {}
+        self.cache_used = 0
+        self.hits, self.misses = 0, 0
+
+    def cache_info(self):
+        """Return (hits, misses, entries, bytes) of the glyph cache.
+        """
+        return self.hits, self.misses, len(self.cache), self.cache_used
+
+    def load_glyph(self, char, codepoint):
+        """Read glyph of CODEPOINT from the font file.
+        """
+        block = self.find_block(codepoint)
+        if block is None:
+            return None
+
+        head_codepoint, tail_codepoint, head, tail, entry_size, width, height = self.block_headers[block]
+
+        if self.version == 2:
+            bitmap = self.v2_bitmap(block, codepoint)
+        elif self.mode == 'index':
+            codepoint_size = entry_size - (width * height + 7) // 8
+            bitmap = self.lookup_bitmap(self.indexes[block], codepoint, head, entry_size, codepoint_size)
+        elif self.mode == 'resident':
+            codepoint_size = entry_size - (width * height + 7) // 8
+            bitmap = self.resident_bitmap(codepoint, head, tail, entry_size, codepoint_size)
+        else:
+            with open(self.font_filename, 'rb') as fp:
+                bitmap = self.bsearch_bitmap(fp, codepoint, head, tail, entry_size)
 
-            bitmap = self.bsearch_bitmap(fp, codepoint, head, tail, entry_size)
-            if bitmap is not None:
-                return Glyph(char, width, height, bitmap)
+        if bitmap is not None:
+            return Glyph(char, width, height, bitmap)
+        else:
+            return None
+
+    def lookup_bitmap(self, index, target, head_pos, entry_size, codepoint_size):
+        """Bisect TARGET in in-RAM INDEX and read its bitmap
+        """
+        head, tail = 0, len(index) - 1
+
+        while head <= tail:
+            mid = (head + tail) // 2
+            code = index[mid]
+
+            if code < target:
+                head = mid + 1
+            elif code > target:
+                tail = mid - 1
+            else:
+                self.fp.seek(head_pos + entry_size * mid + codepoint_size)
+                return self.fp.read(entry_size - codepoint_size)
+
+    def v2_bitmap(self, block, target):
+        """Find TARGET in PFN v2 BLOCK and return its decoded bitmap
+        """
+        _, _, table_pos, data_pos, _, width, height = self.block_headers[block]
+        cps, offsets, starts, num_glyphs = self.groups[block]
+
+        # last group whose first codepoint <= target
+        head, tail = 0, len(cps) - 1
+        while head < tail:
+            mid = (head + tail + 1) // 2
+            if cps[mid] <= target:
+                head = mid
+            else:
+                tail = mid - 1
+        group = head
+
+        start = starts[group]
+        count = (starts[group + 1] if group + 1 < len(starts) else num_glyphs) - start
+
+        fp = self.fp
+        if self.data is None and fp is None:
+            fp = open(self.font_filename, 'rb')
+        try:
+            records = self.read_at(fp, table_pos + 2 * start, 2 * count, self.records)
+
+            code, offset = cps[group], offsets[group]
+            for i in range(0, 2 * count, 2):
+                code += records[i]
+                if code == target:
+                    break
+                if code > target:
+                    return None
+                offset += records[i + 1]
             else:
                 return None
 
+            length = records[i + 1]
+            packed = self.read_at(fp, data_pos + offset, length, self.packed)
+        finally:
+            if fp is not self.fp:
+                fp.close()
+
+        return decode_bitmap(packed, length, (width * height + 7) // 8, width, self.scratch)
+
+    def read_at(self, fp, pos, length, buf):
+        """Read LENGTH bytes at POS of the font into BUF (or a view of
+        the resident image)
+        """
+        if self.data is not None:
+            return memoryview(self.data)[pos:pos + length]
+        mv = memoryview(buf)[:length]
+        fp.seek(pos)
+        fp.readinto(mv)
+        return mv
+
+    def resident_bitmap(self, target, head_pos, tail_pos, entry_size, codepoint_size):
+        """Bisect TARGET in the font image and return a memoryview
+        of its bitmap
+        """
+        head = 0
+        tail = (tail_pos - head_pos) // entry_size
+        label = '<' + '?BH?I'[codepoint_size]
+
+        while head <= tail:
+            mid = (head + tail) // 2
+            pos = head_pos + entry_size * mid
+            code, = unpack_from(label, self.data, pos)
+
+            if code < target:
+                head = mid + 1
+            elif code > target:
+                tail = mid - 1
+            else:
+                return memoryview(self.data)[pos + codepoint_size:pos + entry_size]
+
     def bsearch_bitmap(self, font_fp, target, head_pos, tail_pos, entry_size):
         """B-search font glyph bitmap in region
         target is UTF-32 codepoint
@@ -1,33 +1,119 @@
 class PubSubException(Exception): pass
+
+# Bytes per spooled message, including a 2-byte length; longer
+# messages are published when the broker is up but never spooled.
+# The spool file layout depends on it, so an app keeps one size.
+SPOOL_RECORD_SIZE = 64
+
+class Deadband:
+    """Report-by-exception filter.
+
+    SPEC is a comma separated list of NAME=BAND; BAND is an absolute
+    change or, with a trailing '%', a change relative to the last sent
+    value:
+
+    >>> band = Deadband('co2=20,temperature=0.3,humidity=5%', heartbeat = 3600)
+    >>> if band.check({'co2': 812, 'temperature': 24.8, 'humidity': 41}):
+    ...     publish(...)
+    ...     band.commit(fields)
+
+    check() is also true for the first report and when nothing was sent
+    for HEARTBEAT seconds.  Fields not in SPEC never trigger a report.
+    """
+
+    def __init__(self, spec, heartbeat = 3600):
+        self.bands = {}
+        self.heartbeat = heartbeat
+        self.last = None
+        self.last_time = 0
+
+        for item in spec.split(','):
+            if '=' not in item:
+                continue
+            name, band = item.split('=', 1)
+            band = band.strip()
+            if band.endswith('%'):
+                self.bands[name.strip()] = (0, float(band[:-1]) / 100)
+            else:
+                self.bands[name.strip()] = (float(band), 0)
+
+    def check(self, fields):
+        from time import ticks_ms, ticks_diff
+
+        if self.last is None:
+            return True
+        if self.heartbeat and ticks_diff(ticks_ms(), self.last_time) >= self.heartbeat * 1000:
+            return True
+
+        for name, (absolute, relative) in self.bands.items():
+            if name not in fields:
+                continue
+            last = self.last.get(name)
+            if last is None:
+                return True
+            delta = abs(fields[name] - last)
+            if delta >= absolute + relative * abs(last) and delta > 0:
+                return True
+        return False
+
+    def commit(self, fields):
+        from time import ticks_ms
+        self.last = dict(fields)
+        self.last_time = ticks_ms()
+
 class PubSub:
     """Interface to publish/subscribe
+    SPOOL_RECORD_SIZE bounds the messages kept across MQTT outages.
     """
 
-    def __init__(self, jsonconfig, callback_function = None):
+    def __init__(self, jsonconfig, callback_function = None, spool_record_size = SPOOL_RECORD_SIZE):
         self.mqtt, self.thingspeak = None, None
 
         self.mqtt_pub_topic = jsonconfig.get_str('mqtt_pub_topic')
         self.mqtt_sub_topic = jsonconfig.get_str('mqtt_sub_topic')
         thingspeak_apikey = jsonconfig.get_str('thingspeak_apikey')
+        spool_records = int(jsonconfig.get_str('mqtt_spool_records') or 1440)
+        deadband = jsonconfig.get_str('deadband')
+        self.spool = None
+        self.spool_record_size = spool_record_size
+        self.deadband = None
 
         if self.mqtt_pub_topic or self.mqtt_sub_topic:
-            import mqtt
             print("Setup MQTT connection")
-            self.mqtt = mqtt.mqtt_create_client(jsonconfig)
-            self.mqtt.connect()
+            self.mqtt = self._mqtt_client(jsonconfig)
 
         if self.mqtt_pub_topic:
             print("Setup MQTT pub topic:", self.mqtt_pub_topic)
 
+        if self.mqtt_pub_topic and spool_records != 0:
+            # Unsent messages are kept on flash across outages and reboots
+            from ringlog import RingLog
+            self.spool = RingLog('/data/pending', spool_records, spool_record_size)
+            print("Setup MQTT spool:", len(self.spool), "pending")
+
         if self.mqtt_sub_topic and callback_function:
             print("Setup MQTT sub topic:", self.mqtt_sub_topic)
             self.mqtt.set_callback(callback_function)
-            self.mqtt.subscribe(self.mqtt_sub_topic)
+            self._subscribe()
+
+        if deadband:
+            heartbeat = int(jsonconfig.get_str('deadband_heartbeat') or 3600)
+            self.deadband = Deadband(deadband, heartbeat)
+            print("Setup deadband:", deadband, "heartbeat:", heartbeat)
 
         if thingspeak_apikey:
             print("Setup ThingSpeak")
             from thingspeak import ThingSpeak
-            self.thingspeak = ThingSpeak(apikey)
+            self.thingspeak = ThingSpeak(thingspeak_apikey)
+
+    def _mqtt_client(self, jsonconfig):
+        import mqtt
+        client = mqtt.mqtt_create_client(jsonconfig)
+        client.connect()
+        return client
+
+    def _subscribe(self):
+        self.mqtt.subscribe(self.mqtt_sub_topic)
 
     def refresh_connection(self, timeout = None):
         import time
@@ -42,32 +128,167 @@ class PubSub:
 
         if reconnect > 0:
             self.mqtt.resubscribe()
+            self.mqtt.send_queue()
 
         return reconnect
 
     def check_msg(self):
         if self.mqtt_sub_topic:
-            self.refresh_connection()
+            if self.spool is None:
+                self.refresh_connection()
+            else:
+                # keep sampling (and spooling) while the broker is away
+                try:
+                    self.refresh_connection(timeout = 1)
+                except PubSubException:
+                    return None
             return self.mqtt.check_msg()
 
-    def publish(self, value):
+    def flush_spool(self, chunk = 16):
+        """Publish messages spooled during an outage, oldest first.
+        """
+        while len(self.spool) > 0:
+            records = self.spool.peek(chunk)
+            sent = self.mqtt.publish_many([(self.mqtt_pub_topic, r, False, 0) for r in records])
+            self.spool.pop(sent)
+            if sent < len(records) or self.mqtt.conn_issue:
+                raise PubSubException("spool flush failed")
+            print("Flushed spool:", sent, "sent,", len(self.spool), "pending")
+
+    def publish(self, value, fields = None, thingspeak_fields = None):
+        """Publish VALUE to MQTT and ThingSpeak.
+        With a deadband configured, FIELDS ({name: number}) decides
+        whether VALUE is worth sending; returns False if suppressed.
+        THINGSPEAK_FIELDS (a sequence) goes to field1, field2, ...
+        instead of VALUE.  Only messages up to spool_record_size - 2
+        bytes are spooled while MQTT is unreachable.
+        """
         error_count = 0
+        message = str(value)
+
+        if self.deadband and fields is not None:
+            if not self.deadband.check(fields):
+                print("Publish suppressed by deadband")
+                return False
 
         if self.mqtt:
             try:
                 print("Publish to MQTT")
-                self.refresh_connection()
-                self.mqtt.publish(self.mqtt_pub_topic, str(value))
+                if self.spool is not None:
+                    # do not block sampling while the broker is unreachable
+                    self.refresh_connection(timeout = 1)
+                    self.flush_spool()
+                else:
+                    self.refresh_connection()
+                self.mqtt.publish(self.mqtt_pub_topic, message)
+                if self.mqtt.conn_issue:
+                    raise PubSubException("MQTT connection lost")
             except:
                 print("MQTT publish error")
+                self._spool(message)
                 error_count += 1
 
+        error_count += self._post_thingspeak(value, thingspeak_fields)
+        return self._published(error_count, fields)
+
+    def _spool(self, message):
+        if self.spool is not None:
+            try:
+                self.spool.append(message)
+                print("Spooled:", len(self.spool), "pending")
+            except ValueError:
+                print("Not spooled: message over", self.spool_record_size - 2, "bytes")
+            except Exception as e:
+                print("Spool error:", e)
+
+    def _post_thingspeak(self, value, thingspeak_fields):
+        # returns the number of errors
         if self.thingspeak:
             print("Publish to ThingSpeak")
-            if self.thingspeak.post(field1 = value) != 200:
+            if self.thingspeak.post_fields(list(thingspeak_fields or (value,))) != 200:
                 print("ThingSpeak publish error")
-                error_count += 1
+                return 1
+        return 0
 
+    def _published(self, error_count, fields):
         if error_count > 0:
             print("Publish error")
-            raise "Publish error"
+            raise PubSubException("Publish error")
+
+        if self.deadband and fields is not None:
+            self.deadband.commit(fields)
+        return True
+
+class AsyncPubSub(PubSub):
+    """PubSub on the asyncio MQTT client (lib/asyncmqtt.py).
+    Subscription callbacks fire as soon as a message arrives and lost
+    connections are re-established by a background task, so there is
+    no check_msg() polling; publish() and flush_spool() are coroutines.
+
+    >>> pubsub = AsyncPubSub(jsonconfig, callback)
+    >>> await pubsub.start()
+    >>> await pubsub.publish(message, fields)
+    """
+
+    def _mqtt_client(self, jsonconfig):
+        import mqtt
+        return mqtt.mqtt_create_async_client(jsonconfig)
+
+    def _subscribe(self):
+        # sent by start()
+        pass
+
+    async def start(self):
+        """Connect (retrying in the background if the broker is not
+        reachable yet) and subscribe.
+        """
+        if self.mqtt is None:
+            return
+        await self.mqtt.connect(retry = True)
+        if self.mqtt_sub_topic and self.mqtt.cb is not None:
+            await self.mqtt.subscribe(self.mqtt_sub_topic)
+
+    def check_msg(self):
+        # messages are delivered by the background task
+        return None
+
+    async def flush_spool(self, chunk = 16):
+        """Publish messages spooled during an outage, oldest first.
+        """
+        while len(self.spool) > 0:
+            records = self.spool.peek(chunk)
+            sent = await self.mqtt.publish_many([(self.mqtt_pub_topic, r, False, 0) for r in records])
+            self.spool.pop(sent)
+            if sent < len(records) or not self.mqtt.is_connected():
+                raise PubSubException("spool flush failed")
+            print("Flushed spool:", sent, "sent,", len(self.spool), "pending")
+
+    async def publish(self, value, fields = None, thingspeak_fields = None):
+        """As PubSub.publish(), but never waits for a reconnect: while
+        the background task is reconnecting, VALUE goes to the spool.
+        """
+        error_count = 0
+        message = str(value)
+
+        if self.deadband and fields is not None:
+            if not self.deadband.check(fields):
+                print("Publish suppressed by deadband")
+                return False
+
+        if self.mqtt:
+            try:
+                print("Publish to MQTT")
+                if not self.mqtt.is_connected():
+                    raise PubSubException("MQTT not connected")
+                if self.spool is not None:
+                    await self.flush_spool()
+                await self.mqtt.publish(self.mqtt_pub_topic, message)
+                if not self.mqtt.is_connected():
+                    raise PubSubException("MQTT connection lost")
+            except:
+                print("MQTT publish error")
+                self._spool(message)
+                error_count += 1
+
+        error_count += self._post_thingspeak(value, thingspeak_fields)
+        return self._published(error_count, fields)
@@ -0,0 +1,126 @@
+import os
+from struct import pack, unpack
+
+# On-flash ring log of fixed-size records.
+#
+# PATH.dat: RECORDS slots of RECORD_SIZE bytes:
+#   | size | field name | description                     |
+#   |------+------------+---------------------------------|
+#   |    2 | length     | payload length (little endian)  |
+#   |  n-2 | payload    | record payload, zero padded     |
+#
+# PATH.ptr: two 16-byte pointer slots written alternately:
+#   | size | field name | description                     |
+#   |------+------------+---------------------------------|
+#   |    4 | seq        | incremented on every update     |
+#   |    4 | head       | slot index of the oldest record |
+#   |    4 | count      | number of records in the log    |
+#   |    4 | check      | seq ^ head ^ count ^ MAGIC      |
+#
+# A record is written before the pointer that makes it visible, and
+# the pointer slot not being written always holds the previous state.
+# When the log is full, the oldest record is dropped and the pointer
+# saved before its slot is reused, so no pointer ever covers a slot
+# being written.  A power cut loses at most the record being appended
+# (and, when full, the oldest record it replaces).
+
+MAGIC = 0x50494e4f
+
+class RingLog:
+    """Bounded persistent FIFO of short messages (bytes or str).
+    When full, append() overwrites the oldest record.  Records longer
+    than RECORD_SIZE - 2 bytes are refused with ValueError.
+    """
+
+    def __init__(self, path, records = 1440, record_size = 64):
+        self.path = path
+        self.records = records
+        self.record_size = record_size
+        self.seq, self.head, self.count = 0, 0, 0
+        self.dropped = 0
+        self._load_pointer()
+
+    def __len__(self):
+        return self.count
+
+    def _load_pointer(self):
+        try:
+            with open(self.path + '.ptr', 'rb') as fp:
+                slots = fp.read(32)
+        except OSError:
+            return
+        for i in range(0, len(slots) - 15, 16):
+            seq, head, count, check = unpack('<IIII', slots[i:i + 16])
+            if check == seq ^ head ^ count ^ MAGIC and seq >= self.seq \
+               and head < self.records and count <= self.records:
+                self.seq, self.head, self.count = seq, head, count
+
+    def _save_pointer(self):
+        self.seq += 1
+        slot = pack('<IIII', self.seq, self.head, self.count,
+                    self.seq ^ self.head ^ self.count ^ MAGIC)
+        with self._open('.ptr') as fp:
+            fp.seek((self.seq % 2) * 16)
+            fp.write(slot)
+
+    def _open(self, ext):
+        try:
+            return open(self.path + ext, 'r+b')
+        except OSError:
+            try:
+                os.mkdir(self.path[:self.path.rfind('/')])
+            except OSError:
+                pass
+            return open(self.path + ext, 'w+b')
+
+    def append(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        if len(data) > self.record_size - 2:
+            raise ValueError('record too long')
+
+        if self.count == self.records:
+            # drop the oldest record before its slot is overwritten
+            self.head = (self.head + 1) % self.records
+            self.count -= 1
+            self.dropped += 1
+            self._save_pointer()
+
+        tail = (self.head + self.count) % self.records
+        with self._open('.dat') as fp:
+            fp.seek(tail * self.record_size)
+            fp.write(pack('<H', len(data)) + data + bytes(self.record_size - 2 - len(data)))
+
+        self.count += 1
+        self._save_pointer()
+
+    def peek(self, n = 1):
+        """Return up to N oldest records (bytes) without removing them.
+        """
+        result = []
+        n = min(n, self.count)
+        if n == 0:
+            return result
+        with open(self.path + '.dat', 'rb') as fp:
+            for i in range(n):
+                fp.seek(((self.head + i) % self.records) * self.record_size)
+                record = fp.read(self.record_size)
+                length, = unpack('<H', record[:2])
+                if length <= self.record_size - 2:
+                    result.append(record[2:2 + length])
+                else:
+                    result.append(b'')
+        return result
+
+    def pop(self, n = 1):
+        """Remove up to N oldest records.
+        """
+        n = min(n, self.count)
+        if n > 0:
+            self.head = (self.head + n) % self.records
+            self.count -= n
+            self._save_pointer()
+        return n
+
+    def clear(self):
+        self.pop(self.count)
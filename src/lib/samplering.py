@@ -0,0 +1,78 @@
+from array import array
+from struct import calcsize
+
+class SampleRing:
+    """Fixed-capacity history of sensor samples.
+    Each field is stored in its own typed array (column), so 720
+    SCD30 samples of (co2 'H', temperature 'f', humidity 'f') take
+    about 7 KB.  append() is O(1) and overwrites the oldest sample
+    when full.
+
+    >>> ring = SampleRing(720, (('co2', 'H'), ('temperature', 'f'), ('humidity', 'f')))
+    >>> ring.append(812, 24.8, 41.0)
+    >>> for co2 in ring.window('co2', 60):  # last 60 samples, oldest first
+    ...     print(co2)
+    """
+
+    def __init__(self, capacity, fields):
+        self.capacity = capacity
+        self.names = [name for name, typecode in fields]
+        self.columns = [array(typecode, bytearray(capacity * calcsize(typecode)))
+                        for name, typecode in fields]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        # integer columns round float readings (e.g. SCD30 CO2 ppm)
+        self.rounding = [typecode not in 'fd' for name, typecode in fields]
+        self.head = 0   # slot of the next append
+        self.count = 0
+        self.total = 0  # appends since creation or clear()
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.head, self.count, self.total = 0, 0, 0
+
+    def append(self, *values):
+        head = self.head
+        for column, rounding, value in zip(self.columns, self.rounding, values):
+            column[head] = round(value) if rounding else value
+        self.head = (head + 1) % self.capacity
+        self.total += 1
+        if self.count < self.capacity:
+            self.count += 1
+
+    def column(self, name):
+        return self.columns[self.index[name]]
+
+    def get(self, name, i):
+        """Return I-th sample of NAME; 0 is the oldest, -1 the newest.
+        """
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('sample index out of range')
+        return self.column(name)[(self.head - self.count + i) % self.capacity]
+
+    def last(self, name):
+        return self.get(name, -1)
+
+    def views(self, name, n = None):
+        """Return the newest N samples of NAME as one or two memoryviews
+        (oldest first) into the column; nothing is copied.
+        """
+        if n is None or n > self.count:
+            n = self.count
+        mv = memoryview(self.column(name))
+        start = (self.head - n) % self.capacity
+        if n == 0:
+            return (mv[0:0],)
+        if start + n <= self.capacity:
+            return (mv[start:start + n],)
+        return (mv[start:], mv[:self.head])
+
+    def window(self, name, n = None):
+        """Iterate over the newest N samples of NAME, oldest first.
+        """
+        for view in self.views(name, n):
+            for value in view:
+                yield value
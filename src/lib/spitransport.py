@@ -0,0 +1,128 @@
+# Command/data transport shared by the SPI panel drivers (ILI934X,
+# TFT and ST7789).
+#
+# All buffers are allocated once: the command byte, the column/row
+# window parameters, a single pixel and a fill pattern that is
+# rebuilt only when the fill color changes.  write_window() and
+# fill_window() send CASET, RASET, RAMWR and the pixel data in one
+# transaction: CS stays asserted and only DC toggles between the
+# command and data phases.
+
+import ustruct
+
+FILL_PIXELS = 512       # pixels per fill burst (1 KB)
+
+class SPITransport:
+    """
+    SPI with CS (may be None) and DC pins.  CASET, RASET and RAMWR
+    are the panel's window commands.
+    """
+    def __init__(self, spi, cs, dc, caset = 0x2a, raset = 0x2b, ramwr = 0x2c):
+        self.spi = spi
+        self.cs = cs
+        self.dc = dc
+        self.caset = caset
+        self.raset = raset
+        self.ramwr = ramwr
+        self.cmd = bytearray(1)
+        self.cols = bytearray(4)
+        self.rows = bytearray(4)
+        self.pix = bytearray(2)
+        self.pattern = bytearray(FILL_PIXELS * 2)
+        self.pattern_mv = memoryview(self.pattern)
+        self.pattern_color = None
+
+    def _command(self, command):
+        # within a transaction
+        self.dc(0)
+        self.cmd[0] = command
+        self.spi.write(self.cmd)
+        self.dc(1)
+
+    def command(self, command, data = None):
+        """Send COMMAND and its parameter DATA in one transaction.
+        """
+        if self.cs is not None:
+            self.cs(0)
+        self._command(command)
+        if data:
+            self.spi.write(data)
+        if self.cs is not None:
+            self.cs(1)
+
+    def data(self, data):
+        if self.cs is not None:
+            self.cs(0)
+        self.dc(1)
+        self.spi.write(data)
+        if self.cs is not None:
+            self.cs(1)
+
+    def read(self, command, count, dummy = 1):
+        """Send COMMAND and return COUNT bytes read after DUMMY bytes.
+        """
+        if self.cs is not None:
+            self.cs(0)
+        self._command(command)
+        if dummy:
+            self.spi.read(dummy)
+        data = self.spi.read(count)
+        if self.cs is not None:
+            self.cs(1)
+        return data
+
+    def _window(self, x0, y0, x1, y1):
+        # within a transaction; leaves DC high for the pixel data
+        ustruct.pack_into('>HH', self.cols, 0, x0, x1)
+        ustruct.pack_into('>HH', self.rows, 0, y0, y1)
+        self._command(self.caset)
+        self.spi.write(self.cols)
+        self._command(self.raset)
+        self.spi.write(self.rows)
+        self._command(self.ramwr)
+
+    def write_window(self, x0, y0, x1, y1, data):
+        """Set the window (inclusive) and write DATA in one transaction.
+        """
+        if self.cs is not None:
+            self.cs(0)
+        self._window(x0, y0, x1, y1)
+        self.spi.write(data)
+        if self.cs is not None:
+            self.cs(1)
+
+    def pixel(self, x, y, color):
+        self.pix[0] = color >> 8 & 0xff
+        self.pix[1] = color & 0xff
+        self.write_window(x, y, x, y, self.pix)
+
+    def fill_pattern(self, color):
+        """Return FILL_PIXELS pixels of COLOR, cached for the last color.
+        """
+        if color != self.pattern_color:
+            pattern = self.pattern
+            pattern[0] = color >> 8 & 0xff
+            pattern[1] = color & 0xff
+            n, total = 2, len(pattern)
+            while n < total:
+                # doubling; the last copy may be partial
+                step = min(n, total - n)
+                pattern[n:n + step] = pattern[:step]
+                n += step
+            self.pattern_color = color
+        return self.pattern_mv
+
+    def fill_window(self, x0, y0, x1, y1, color):
+        """Fill the window (inclusive) with COLOR in one transaction.
+        """
+        pattern = self.fill_pattern(color)
+        chunks, rest = divmod((x1 - x0 + 1) * (y1 - y0 + 1), FILL_PIXELS)
+        if self.cs is not None:
+            self.cs(0)
+        self._window(x0, y0, x1, y1)
+        for _ in range(chunks):
+            self.spi.write(pattern)
+        if rest:
+            self.spi.write(pattern[:rest * 2])
+        if self.cs is not None:
+            self.cs(1)
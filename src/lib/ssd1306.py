@@ -31,6 +31,11 @@ SET_CHARGE_PUMP = const(0x8D)
 
 # Subclassing FrameBuffer provides support for graphics primitives
 # http://docs.micropython.org/en/latest/pyboard/library/framebuf.html
+#
+# Drawing methods record a dirty column range per page, and show()
+# sends only those windows.  Methods not overridden here (ellipse,
+# poly, ...) or direct writes to self.buffer must be followed by
+# invalidate().
 class SSD1306(framebuf.FrameBuffer):
     def __init__(self, width, height, external_vcc):
         self.width = width
@@ -38,6 +43,10 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        # dirty columns of each page are dirty_lo[p]..dirty_hi[p]
+        self.dirty_lo = bytearray(self.pages)
+        self.dirty_hi = bytearray(self.pages)
+        self.invalidate()
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
         self.init_display()
 
@@ -97,21 +106,112 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_COM_OUT_DIR | ((rotate & 1) << 3))
         self.write_cmd(SET_SEG_REMAP | (rotate & 1))
 
+    def invalidate(self):
+        """Mark the whole screen dirty."""
+        for page in range(self.pages):
+            self.dirty_lo[page] = 0
+            self.dirty_hi[page] = self.width - 1
+
+    def mark(self, x, y, w, h):
+        """Mark the rectangle (X, Y, W, H) dirty."""
+        x0 = max(0, x)
+        x1 = min(self.width, x + w) - 1
+        y0 = max(0, y)
+        y1 = min(self.height, y + h) - 1
+        if x0 > x1 or y0 > y1:
+            return
+        lo, hi = self.dirty_lo, self.dirty_hi
+        for page in range(y0 >> 3, (y1 >> 3) + 1):
+            if lo[page] > hi[page]:
+                lo[page], hi[page] = x0, x1
+            else:
+                lo[page] = min(lo[page], x0)
+                hi[page] = max(hi[page], x1)
+
+    def fill(self, c):
+        super().fill(c)
+        self.invalidate()
+
+    def fill_rect(self, x, y, w, h, c):
+        super().fill_rect(x, y, w, h, c)
+        self.mark(x, y, w, h)
+
+    def rect(self, x, y, w, h, c, *f):
+        super().rect(x, y, w, h, c, *f)
+        self.mark(x, y, w, h)
+
+    def pixel(self, x, y, *c):
+        if not c:
+            return super().pixel(x, y)
+        super().pixel(x, y, c[0])
+        self.mark(x, y, 1, 1)
+
+    def hline(self, x, y, w, c):
+        super().hline(x, y, w, c)
+        self.mark(x, y, w, 1)
+
+    def vline(self, x, y, h, c):
+        super().vline(x, y, h, c)
+        self.mark(x, y, 1, h)
+
+    def line(self, x1, y1, x2, y2, c):
+        super().line(x1, y1, x2, y2, c)
+        self.mark(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
+
+    def text(self, s, x, y, c=1):
+        super().text(s, x, y, c)
+        self.mark(x, y, 8 * len(s), 8)
+
+    def blit(self, fbuf, x, y, *args):
+        super().blit(fbuf, x, y, *args)
+        self.invalidate()
+
+    def scroll(self, xstep, ystep):
+        super().scroll(xstep, ystep)
+        self.invalidate()
+
+    def glyph(self, glyph, x, y, color=1, background=0):
+        # pnfont.Glyph: one dirty mark per glyph instead of per pixel
+        px = super().pixel
+        w = glyph.width
+        for gy in range(glyph.height):
+            for gx in range(w):
+                px(x + gx, y + gy, color if glyph.pixel(gx, gy) else background)
+        self.mark(x, y, w, glyph.height)
+
     def show(self):
-        x0 = 0
-        x1 = self.width - 1
+        col_offset = 0
         if self.width != 128:
             # narrow displays use centred columns
             col_offset = (128 - self.width) // 2
-            x0 += col_offset
-            x1 += col_offset
-        self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
-        self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        lo, hi = self.dirty_lo, self.dirty_hi
+        buf = memoryview(self.buffer)
+
+        # one window per run of consecutive dirty pages
+        page = 0
+        while page < self.pages:
+            if lo[page] > hi[page]:
+                page += 1
+                continue
+            first, x0, x1 = page, lo[page], hi[page]
+            while page + 1 < self.pages and lo[page + 1] <= hi[page + 1]:
+                page += 1
+                x0 = min(x0, lo[page])
+                x1 = max(x1, hi[page])
+            self.write_cmd(SET_COL_ADDR)
+            self.write_cmd(x0 + col_offset)
+            self.write_cmd(x1 + col_offset)
+            self.write_cmd(SET_PAGE_ADDR)
+            self.write_cmd(first)
+            self.write_cmd(page)
+            if x0 == 0 and x1 == self.width - 1:
+                self.write_data(buf[first * self.width:(page + 1) * self.width])
+            else:
+                for p in range(first, page + 1):
+                    self.write_data(buf[p * self.width + x0:p * self.width + x1 + 1])
+            for p in range(first, page + 1):
+                lo[p], hi[p] = 0xff, 0
+            page += 1
 
 
 class SSD1306_I2C(SSD1306):
@@ -45,6 +45,8 @@ This driver adds support for:
 import time
 from micropython import const
 import ustruct as struct
+from glyph565 import Glyph565
+from spitransport import SPITransport
 
 # commands
 ST7789_NOP = const(0x00)
@@ -200,6 +202,9 @@ class ST7789():
         self.cs = cs
         self.backlight = backlight
         self._rotation = rotation % 4
+        self._glyph565 = Glyph565()
+        self._transport = SPITransport(
+            spi, cs, dc, ST7789_CASET, ST7789_RASET, ST7789_RAMWR)
 
         self.hard_reset()
         self.soft_reset()
@@ -220,17 +225,10 @@ class ST7789():
 
     def _write(self, command=None, data=None):
         """SPI write to the device: commands and data."""
-        if self.cs:
-            self.cs.off()
-
         if command is not None:
-            self.dc.off()
-            self.spi.write(bytes([command]))
-        if data is not None:
-            self.dc.on()
-            self.spi.write(data)
-            if self.cs:
-                self.cs.on()
+            self._transport.command(command, data)
+        elif data is not None:
+            self._transport.data(data)
 
     def hard_reset(self):
         """
@@ -362,6 +360,13 @@ class ST7789():
         self._set_rows(y0, y1)
         self._write(ST7789_RAMWR)
 
+    def _in_window(self, x0, y0, x1, y1):
+        """
+        True if _set_window() would send both CASET and RASET, so the
+        window and its data can go out in one transaction.
+        """
+        return x0 <= x1 <= self.width and y0 <= y1 <= self.height
+
     def vline(self, x, y, length, color):
         """
         Draw vertical line at the given location and color.
@@ -395,6 +400,9 @@ class ST7789():
             Y (int): y coordinate
             color (int): 565 encoded color
         """
+        if self._in_window(x, y, x, y):
+            self._transport.pixel(x + self.xstart, y + self.ystart, color)
+            return
         self._set_window(x, y, x, y)
         self._write(None, _encode_pixel(color))
 
@@ -409,42 +417,22 @@ class ST7789():
             width (int): Width
             height (int): Height
         """
-        self._set_window(x, y, x + width - 1, y + height - 1)
+        x1, y1 = x + width - 1, y + height - 1
+        if self._in_window(x, y, x1, y1):
+            self._transport.write_window(
+                x + self.xstart, y + self.ystart,
+                x1 + self.xstart, y1 + self.ystart, buffer)
+            return
+        self._set_window(x, y, x1, y1)
         self._write(None, buffer)
 
     def glyph(self, glyph, x, y, color=0xffff, background=0x0000):
-        fg1, fg2 = struct.pack(">H", color)
-        bg1, bg2  = struct.pack(">H", background)
-        data = bytearray()
-        for b in glyph.bitmap:
-            p0 = (b >> 7) & 1
-            p1 = (b >> 6) & 1
-            p2 = (b >> 5) & 1
-            p3 = (b >> 4) & 1
-            p4 = (b >> 3) & 1
-            p5 = (b >> 2) & 1
-            p6 = (b >> 1) & 1
-            p7 = (b >> 0) & 1
-            data.extend(bytearray([
-                fg1 * p0 + bg1 * (1 - p0),
-                fg2 * p0 + bg2 * (1 - p0),
-                fg1 * p1 + bg1 * (1 - p1),
-                fg2 * p1 + bg2 * (1 - p1),
-                fg1 * p2 + bg1 * (1 - p2),
-                fg2 * p2 + bg2 * (1 - p2),
-                fg1 * p3 + bg1 * (1 - p3),
-                fg2 * p3 + bg2 * (1 - p3),
-                fg1 * p4 + bg1 * (1 - p4),
-                fg2 * p4 + bg2 * (1 - p4),
-                fg1 * p5 + bg1 * (1 - p5),
-                fg2 * p5 + bg2 * (1 - p5),
-                fg1 * p6 + bg1 * (1 - p6),
-                fg2 * p6 + bg2 * (1 - p6),
-                fg1 * p7 + bg1 * (1 - p7),
-                fg2 * p7 + bg2 * (1 - p7)
-            ]))
+        data = self._glyph565.expand(glyph, color, background)
         self.blit_buffer(data, x, y, glyph.width, glyph.height)
 
+    def blit565(self, data, x, y, w, h):
+        self.blit_buffer(data, x, y, w, h)
+
     def rect(self, x, y, w, h, color):
         """
         Draw a rectangle at the given location, size and color.
@@ -472,7 +460,13 @@ class ST7789():
             height (int): Height in pixels
             color (int): 565 encoded color
         """
-        self._set_window(x, y, x + width - 1, y + height - 1)
+        x1, y1 = x + width - 1, y + height - 1
+        if self._in_window(x, y, x1, y1):
+            self._transport.fill_window(
+                x + self.xstart, y + self.ystart,
+                x1 + self.xstart, y1 + self.ystart, color)
+            return
+        self._set_window(x, y, x1, y1)
         chunks, rest = divmod(width * height, _BUFFER_SIZE)
         pixel = _encode_pixel(color)
         self.dc.on()
@@ -562,6 +556,25 @@ class ST7789():
         """
         self._write(ST7789_VSCSAD, struct.pack(">H", vssa))
 
+    def vscroll_area(self, y, height):
+        """
+        Scroll rows y..y+height-1 in hardware (see vscroll_start).
+
+        Returns False in rotations other than portrait, where the frame
+        memory scrolls sideways or mirrored.
+        """
+        if self._rotation != 0:
+            return False
+        self._vscroll_top = self.ystart + y
+        self.vscrdef(self._vscroll_top, height, 320 - self._vscroll_top - height)
+        return True
+
+    def vscroll_start(self, line):
+        """
+        Show row y+line at the top of the area set by vscroll_area.
+        """
+        self.vscsad(self._vscroll_top + line)
+
     def _text8(self, font, text, x0, y0, color=WHITE, background=BLACK):
         """
         Internal method to write characters with width of 8 and
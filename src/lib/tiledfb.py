@@ -0,0 +1,194 @@
+# Off-screen RGB565 backing store for the SPI panels (ILI934X, TFT,
+# ST7789).
+#
+# The screen is split into horizontal tiles of TILE_HEIGHT rows, each
+# a framebuf.FrameBuffer allocated on first draw.  Drawing only
+# touches RAM and records a dirty rectangle per tile; show() sends
+# each dirty rectangle with one window set and one data burst.
+#
+# A full 240x320 store is 150 KB, so ROWS limits it to the top rows
+# (e.g. a status area); drawing below ROWS goes straight to the panel.
+#
+#   panel = TiledPanel(ILI934X(spi, cs = Pin(17), dc = Pin(5), rst = Pin(4)), rows = 64)
+#   disp = PinotDisplay(panel, font)
+#
+# framebuf keeps RGB565 little-endian while the panels take it
+# big-endian, so colors are byte-swapped on the way in and tiles can
+# be sent as they are.
+
+import framebuf
+from glyph565 import Glyph565
+
+def swap16(color):
+    return (color & 0xff) << 8 | color >> 8 & 0xff
+
+class TiledPanel:
+    """
+    Tiled framebuffer in front of PANEL, which needs width, height,
+    fill(color), fill_rect(), pixel() and blit565().  The panel's
+    scroll(), vscroll(), vscroll_area() and vscroll_start(), where it
+    has them, are passed through after a show().
+    """
+    def __init__(self, panel, tile_height = 16, rows = None):
+        self.panel = panel
+        self.width = panel.width
+        self.height = panel.height
+        self.tile_height = tile_height
+        self.rows = min(rows or self.height, self.height)
+        count = (self.rows + tile_height - 1) // tile_height
+        self.tiles = [None] * count     # (bytearray, FrameBuffer)
+        self.dirty = [None] * count     # [x0, y0, x1, y1) within the tile
+        self.background = 0x0000        # color of tiles not drawn yet
+        self.scratch = bytearray(0)
+        self._glyph565 = Glyph565()
+        # PinotDisplay picks its scroll method by presence
+        for name in ('scroll', 'vscroll', 'vscroll_area', 'vscroll_start'):
+            method = getattr(panel, name, None)
+            if callable(method):
+                setattr(self, name, self._flushed(method))
+
+    def _flushed(self, method):
+        def call(*args):
+            self.show()
+            return method(*args)
+        return call
+
+    def tile(self, i):
+        tile = self.tiles[i]
+        if tile is None:
+            height = min(self.tile_height, self.rows - i * self.tile_height)
+            buf = bytearray(self.width * height * 2)
+            fb = framebuf.FrameBuffer(buf, self.width, height, framebuf.RGB565)
+            if self.background:
+                fb.fill(swap16(self.background))
+            tile = self.tiles[i] = (buf, fb)
+        return tile
+
+    def ram_size(self):
+        """Bytes allocated for tiles so far.
+        """
+        return sum(len(tile[0]) for tile in self.tiles if tile is not None)
+
+    def mark(self, i, x0, y0, x1, y1):
+        d = self.dirty[i]
+        if d is None:
+            self.dirty[i] = [x0, y0, x1, y1]
+        else:
+            d[0], d[1] = min(d[0], x0), min(d[1], y0)
+            d[2], d[3] = max(d[2], x1), max(d[3], y1)
+
+    def fill(self, color):
+        # drop the tiles instead of filling all of them
+        self.tiles = [None] * len(self.tiles)
+        self.dirty = [None] * len(self.dirty)
+        self.background = color
+        self.panel.fill(color)
+
+    def fill_rect(self, x, y, w, h, color):
+        x0, x1 = max(0, x), min(self.width, x + w)
+        y0, y1 = max(0, y), min(self.height, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if y1 > self.rows:
+            top = max(y0, self.rows)
+            self.panel.fill_rect(x0, top, x1 - x0, y1 - top, color)
+            y1 = self.rows
+        color = swap16(color)
+        th = self.tile_height
+        y = y0
+        while y < y1:
+            i, top = y // th, y // th * th
+            bottom = min(y1, top + th)
+            self.tile(i)[1].fill_rect(x0, y - top, x1 - x0, bottom - y, color)
+            self.mark(i, x0, y - top, x1, bottom - top)
+            y = bottom
+
+    def hline(self, x, y, w, color):
+        self.fill_rect(x, y, w, 1, color)
+
+    def vline(self, x, y, h, color):
+        self.fill_rect(x, y, 1, h, color)
+
+    def rect(self, x, y, w, h, color):
+        self.fill_rect(x, y, w, 1, color)
+        self.fill_rect(x, y + h - 1, w, 1, color)
+        self.fill_rect(x, y, 1, h, color)
+        self.fill_rect(x + w - 1, y, 1, h, color)
+
+    def pixel(self, x, y, color = None):
+        if not 0 <= x < self.width or not 0 <= y < self.height:
+            return
+        if y >= self.rows:
+            return self.panel.pixel(x, y, color)
+        i, top = y // self.tile_height, y // self.tile_height * self.tile_height
+        if color is None:
+            if self.tiles[i] is None:
+                return self.background
+            return swap16(self.tiles[i][1].pixel(x, y - top))
+        self.tile(i)[1].pixel(x, y - top, swap16(color))
+        self.mark(i, x, y - top, x + 1, y - top + 1)
+
+    def blit565(self, data, x, y, w, h):
+        """Copy big-endian RGB565 DATA (W x H) to (X, Y).
+        """
+        x0, x1 = max(0, x), min(self.width, x + w)
+        if x0 >= x1:
+            return
+        src = memoryview(data)
+        n, skip, th = (x1 - x0) * 2, (x0 - x) * 2, self.tile_height
+        r = max(0, -y)
+        while r < h and y + r < self.rows:
+            i, top = (y + r) // th, (y + r) // th * th
+            buf = self.tile(i)[0]
+            r0 = r
+            bottom = min(h, top + th - y, self.rows - y)
+            while r < bottom:
+                o = ((y + r - top) * self.width + x0) * 2
+                s = r * w * 2 + skip
+                buf[o:o + n] = src[s:s + n]
+                r += 1
+            self.mark(i, x0, y + r0 - top, x1, y + r - top)
+        h = min(h, self.height - y)
+        if r < h:
+            # below the store, clipped as the drivers do not
+            if n == w * 2:
+                data = src[r * w * 2:h * w * 2]
+            else:
+                data = self.gather(src, w * 2, r * w * 2 + skip, n, h - r)
+            self.panel.blit565(data, x0, y + r, x1 - x0, h - r)
+
+    def gather(self, src, stride, offset, n, rows):
+        """Copy ROWS runs of N bytes, STRIDE apart from OFFSET in SRC,
+        into the scratch buffer and return them.
+        """
+        if len(self.scratch) < n * rows:
+            self.scratch = bytearray(max(n * rows, self.width * self.tile_height * 2))
+        o = 0
+        for r in range(rows):
+            s = offset + r * stride
+            self.scratch[o:o + n] = src[s:s + n]
+            o += n
+        return memoryview(self.scratch)[:o]
+
+    def glyph(self, glyph, x, y, color = 0xffff, background = 0x0000):
+        data = self._glyph565.expand(glyph, color, background)
+        self.blit565(data, x, y, glyph.width, glyph.height)
+
+    def show(self):
+        """Send each dirty rectangle with one window set and burst.
+        """
+        width = self.width
+        for i, d in enumerate(self.dirty):
+            if d is None:
+                continue
+            x0, y0, x1, y1 = d
+            w, h = x1 - x0, y1 - y0
+            buf = memoryview(self.tiles[i][0])
+            if w == width:
+                data = buf[y0 * width * 2:y1 * width * 2]
+            else:
+                data = self.gather(buf, width * 2, (y0 * width + x0) * 2, w * 2, h)
+            self.panel.blit565(data, x0, i * self.tile_height + y0, w, h)
+            self.dirty[i] = None
+        if callable(getattr(self.panel, "show", None)):
+            self.panel.show()
@@ -1,7 +1,7 @@
-from utime import ticks_ms,ticks_diff
+from utime import ticks_add,ticks_ms,ticks_diff
 from .  import simple2
 class MQTTClient(simple2.MQTTClient):
-	DEBUG=False;KEEP_QOS0=True;NO_QUEUE_DUPS=True;MSG_QUEUE_MAX=5;CONFIRM_QUEUE_MAX=10;RESUBSCRIBE=True
+	DEBUG=False;KEEP_QOS0=True;NO_QUEUE_DUPS=True;MSG_QUEUE_MAX=5;RESUBSCRIBE=True;SEND_BUF_MAX=1024
 	def __init__(A,*B,**C):super().__init__(*B,**C);A.subs=[];A.msg_to_send=[];A.sub_to_send=[];A.msg_to_confirm={};A.sub_to_confirm={};A.conn_issue=None
 	def is_keepalive(A):
 		B=ticks_diff(ticks_ms(),A.last_cpacket)//1000
@@ -12,21 +12,12 @@ class MQTTClient(simple2.MQTTClient):
 		E=stat;D=pid
 		try:A._cbstat(D,E)
 		except AttributeError:pass
-		for (B,C) in A.msg_to_confirm.items():
-			if D in C:
-				if E==0:
-					if B not in A.msg_to_send:A.msg_to_send.insert(0,B)
-					C.remove(D)
-					if not C:A.msg_to_confirm.pop(B)
-				elif E in(1,2):A.msg_to_confirm.pop(B)
-				return
-		for (B,C) in A.sub_to_confirm.items():
-			if D in C:
-				if E==0:
-					if B not in A.sub_to_send:A.sub_to_send.append(B)
-					C.remove(D)
-					if not C:A.sub_to_confirm.pop(B)
-				elif E in(1,2):A.sub_to_confirm.pop(B)
+		B=A.msg_to_confirm.pop(D,None)
+		if B is not None:
+			if E==0 and B not in A.msg_to_send:A.msg_to_send.insert(0,B)
+			return
+		B=A.sub_to_confirm.pop(D,None)
+		if B is not None and E==0 and B not in A.sub_to_send:A.sub_to_send.append(B)
 	def connect(A,clean_session=True):
 		B=clean_session
 		if B:A.msg_to_send[:]=[];A.msg_to_confirm.clear()
@@ -45,14 +36,14 @@ class MQTTClient(simple2.MQTTClient):
 	def resubscribe(A):
 		for (B,C) in A.subs:A.subscribe(B,C,False)
 	def add_msg_to_send(A,data):
-		C=len(A.msg_to_send);C+=sum(map(len,A.msg_to_confirm.values()))
+		C=len(A.msg_to_send)+len(A.msg_to_confirm)
 		while C>=A.MSG_QUEUE_MAX:
-			E=min(map(lambda x:x[0]if x else 65535,A.msg_to_confirm.values()),default=0)
-			if 0<E<65535:
-				B=None
-				for (F,D) in A.msg_to_confirm.items():
-					if D and D[0]==E:del D[0];B=F;break
-				if B and B in A.msg_to_confirm and not A.msg_to_confirm[B]:A.msg_to_confirm.pop(B)
+			D=A._dlh;B=None
+			while D<len(A._dlq):
+				E,F=A._dlq[D]
+				if E in A.msg_to_confirm and A.rcv_pids.get(E)==F:B=E;break
+				D+=1
+			if B is not None:A.msg_to_confirm.pop(B)
 			else:A.msg_to_send.pop(0)
 			C-=1
 		A.msg_to_send.append(data)
@@ -68,9 +59,7 @@ class MQTTClient(simple2.MQTTClient):
 		if D:A.msg_to_send[:]=[B for B in A.msg_to_send if not(E==B[0]and D==B[2])]
 		try:
 			F=super().publish(E,msg,D,B,False)
-			if B==1:
-				A.msg_to_confirm.setdefault(C,[]).append(F)
-				if len(A.msg_to_confirm[C])>A.CONFIRM_QUEUE_MAX:A.msg_to_confirm.pop(0)
+			if B==1:A.msg_to_confirm[F]=C
 			return F
 		except (OSError,simple2.MQTTException)as G:
 			A.conn_issue=G,2
@@ -84,29 +73,42 @@ class MQTTClient(simple2.MQTTClient):
 			if C not in dict(A.subs):A.subs.append(B)
 		A.sub_to_send[:]=[B for B in A.sub_to_send if C!=B[0]]
 		try:
-			D=super().subscribe(C,qos);A.sub_to_confirm.setdefault(B,[]).append(D)
-			if len(A.sub_to_confirm[B])>A.CONFIRM_QUEUE_MAX:A.sub_to_confirm.pop(0)
-			return D
+			D=super().subscribe(C,qos);A.sub_to_confirm[D]=B;return D
 		except (OSError,simple2.MQTTException)as E:
 			A.conn_issue=E,3
 			if A.NO_QUEUE_DUPS:
 				if B in A.sub_to_send:return
 			A.sub_to_send.append(B)
+	def _publish_many(A,msgs):
+		B=0;C=[];D=0
+		try:
+			for E in msgs:
+				B,F=A._pack_publish(B,E[0],E[1],E[2],E[3]);C.append((E,F))
+				if B>=A.SEND_BUF_MAX:A._write(A._wbuf,B);A._track_many(C);D+=len(C);B=0;C=[]
+			if B:A._write(A._wbuf,B);A._track_many(C);D+=len(C)
+		except (OSError,simple2.MQTTException)as G:return D,G
+		return D,None
+	def _track_many(A,sent):
+		B=ticks_add(ticks_ms(),A.message_timeout*1000)
+		for (C,D) in sent:
+			if D:A._track_pid(D,B);A.msg_to_confirm[D]=C
+	def publish_many(A,msgs):
+		B=list(msgs);C,D=A._publish_many(B)
+		if D:
+			A.conn_issue=D,2
+			for E in B[C:]:
+				if A.NO_QUEUE_DUPS and E in A.msg_to_send:continue
+				if A.KEEP_QOS0 and E[3]==0 or E[3]==1:A.add_msg_to_send(E)
+		return C
 	def send_queue(A):
-		D=[]
-		for B in A.msg_to_send:
-			E,I,J,C=B
-			try:
-				F=super().publish(E,I,J,C,False)
-				if C==1:A.msg_to_confirm.setdefault(B,[]).append(F)
-				D.append(B)
-			except (OSError,simple2.MQTTException)as G:A.conn_issue=G,5;return False
-		A.msg_to_send[:]=[B for B in A.msg_to_send if B not in D];del D;H=[]
+		C,D=A._publish_many(A.msg_to_send);del A.msg_to_send[:C]
+		if D:A.conn_issue=D,5;return False
+		C=0
 		for B in A.sub_to_send:
-			E,C=B
-			try:F=super().subscribe(E,C);A.sub_to_confirm.setdefault(B,[]).append(F);H.append(B)
-			except (OSError,simple2.MQTTException)as G:A.conn_issue=G,5;return False
-		A.sub_to_send[:]=[B for B in A.sub_to_send if B not in H];return True
+			E,F=B
+			try:G=super().subscribe(E,F);A.sub_to_confirm[G]=B;C+=1
+			except (OSError,simple2.MQTTException)as D:A.conn_issue=D,5;del A.sub_to_send[:C];return False
+		del A.sub_to_send[:C];return True
 	def is_conn_issue(A):
 		A.is_keepalive()
 		if A.conn_issue:A.log()
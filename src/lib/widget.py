@@ -0,0 +1,235 @@
+# Retained-mode widgets for status screens on a PinotDisplay.
+#
+# Each widget keeps what it last rendered and its bounding box; set()
+# marks it dirty only if the rendered content would change, and
+# Screen.update() redraws dirty widgets inside one defer()/flush(),
+# so a frame costs one panel transfer:
+#
+#   screen = Screen(disp)
+#   co2 = screen.add(Field(disp, 0, 0, 'CO2 {:.0f}ppm', width = disp.panel.width))
+#   et = screen.add(Field(disp, 0, 17, 'E/T {}/{}'))
+#   trend = screen.add(Sparkline(disp, 160, 0, 80, 16))
+#   alarm = screen.add(Banner(disp, 0, 34, disp.panel.width))
+#
+#   co2.set(812.3)
+#   et.set(0, 120)
+#   trend.push(812.3)
+#   alarm.show('換気してください')
+#   screen.update()
+#
+# Colors are panel colors: RGB565 on color panels; on SSD1306 any
+# nonzero value is "on".
+
+class Widget:
+    """
+    A box at (X, Y) that is redrawn only when its content changes.
+    """
+    def __init__(self, disp, x, y, width = None, height = None,
+                 color = 0xffff, background = 0x0000):
+        self.disp = disp
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height or disp.line_height - 1
+        self.color = color
+        self.background = background
+        self.content = None     # what should be shown
+        self.drawn = None       # what is on the panel
+        self.box = (0, 0)       # (width, height) covered on the panel
+
+    def dirty(self):
+        return self.content != self.drawn
+
+    def invalidate(self):
+        """Force a redraw (e.g. after the panel was cleared).
+        """
+        self.drawn = None
+        self.box = (0, 0)
+
+    def render(self):
+        """Redraw if dirty; return True if drawn.
+        """
+        if not self.dirty():
+            return False
+        w, h = self.draw()
+        old_w, old_h = self.box
+        # erase what the previous content covered beyond the new one
+        if old_w > w:
+            self.disp.panel.fill_rect(self.x + w, self.y, old_w - w, max(h, old_h), self.background)
+        if old_h > h and w > 0:
+            self.disp.panel.fill_rect(self.x, self.y + h, w, old_h - h, self.background)
+        self.box = (w, h)
+        self.drawn = self.content
+        return True
+
+    def draw(self):
+        """Draw self.content; return (width, height) covered.
+        Subclasses override this; a bare Widget draws nothing.
+        """
+        return 0, 0
+
+class Label(Widget):
+    """
+    One line of text.  If WIDTH is given, the rest of the box is
+    filled with the background.
+    """
+    def __init__(self, disp, x, y, text = '', **kwargs):
+        super().__init__(disp, x, y, **kwargs)
+        self.content = text
+
+    def set(self, text):
+        self.content = text
+
+    def draw(self):
+        w, h = self.disp.put_text(self.x, self.y, self.content, self.color, self.background)
+        h = max(h, self.height)
+        if self.width is not None and self.width > w:
+            self.disp.panel.fill_rect(self.x + w, self.y, self.width - w, h, self.background)
+            w = self.width
+        return w, h
+
+class Field(Label):
+    """
+    Label formatted from values; a new value that formats the same
+    (e.g. 812.3 -> 812.4 with '{:.0f}') is not redrawn.
+    """
+    def __init__(self, disp, x, y, fmt = '{}', **kwargs):
+        super().__init__(disp, x, y, '', **kwargs)
+        self.fmt = fmt
+
+    def set(self, *values):
+        self.content = self.fmt.format(*values)
+
+class Banner(Label):
+    """
+    Alarm banner: inverted text across WIDTH while shown, background
+    while hidden.
+    """
+    def __init__(self, disp, x, y, width, color = 0x0000, background = 0xffff,
+                 clear = 0x0000, **kwargs):
+        super().__init__(disp, x, y, '', width = width, color = color,
+                         background = background, **kwargs)
+        self.clear = clear
+        self.content = None
+
+    def show(self, text):
+        self.content = text
+
+    def hide(self):
+        self.content = None
+
+    def draw(self):
+        if self.content is None:
+            self.disp.panel.fill_rect(self.x, self.y, self.width, self.height, self.clear)
+            return self.width, self.height
+        return super().draw()
+
+class Sparkline(Widget):
+    """
+    Sweep chart of the last WIDTH - 1 values pushed, scaled to LO..HI
+    (default: min..max of the values shown).  As in graph.TrendGraph,
+    a push redraws only its own column, the gap ahead and the column
+    after it; the whole box is redrawn only after invalidate() or
+    when a value falls outside the range on the panel.
+    """
+    def __init__(self, disp, x, y, width, height, lo = None, hi = None, **kwargs):
+        super().__init__(disp, x, y, width, height, **kwargs)
+        self.lo = lo
+        self.hi = hi
+        self.values = [None] * width    # by column; None is blank
+        self.pos = 0                    # column of the next value
+        self.new = 0                    # values pushed since drawn
+        self.range = None               # (lo, hi) of what is on the panel
+        self.version = 0
+        self.content = 0
+
+    def push(self, value):
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % self.width
+        self.values[self.pos] = None    # gap ahead of the newest value
+        self.new += 1
+        self.version += 1
+        self.content = self.version
+
+    def invalidate(self):
+        super().invalidate()
+        self.range = None
+
+    def fit(self):
+        shown = [v for v in self.values if v is not None]
+        lo = self.lo if self.lo is not None else min(shown) if shown else 0
+        hi = self.hi if self.hi is not None else max(shown) if shown else 0
+        return lo, hi
+
+    def outside(self, value):
+        # True if VALUE would grow an automatic range
+        lo, hi = self.range
+        return (self.lo is None and value < lo) or (self.hi is None and value > hi)
+
+    def row(self, value):
+        lo, hi = self.range
+        scale = (self.height - 1) / (hi - lo) if hi > lo else 0
+        return self.y + self.height - 1 - int((min(max(value, lo), hi) - lo) * scale + 0.5)
+
+    def column(self, c):
+        """Draw column C, joined to the value left of it.
+        """
+        value = self.values[c]
+        if value is None:
+            return
+        y = self.row(value)
+        prev = self.values[c - 1] if c > 0 else None
+        top, bottom = y, y
+        if prev is not None:
+            p = self.row(prev)
+            top, bottom = min(y, p), max(y, p)
+        self.disp.panel.fill_rect(self.x + c, top, 1, bottom - top + 1, self.color)
+
+    def draw(self):
+        panel, width = self.disp.panel, self.width
+        new = min(self.new, width)
+        cols = [(self.pos - i) % width for i in range(new, 0, -1)]
+        if self.range is not None and new < width - 1:
+            if not any(self.outside(self.values[c]) for c in cols):
+                # new columns, the gap ahead and the oldest column,
+                # which loses its join to the column the gap took
+                for c in cols + [self.pos, (self.pos + 1) % width]:
+                    panel.fill_rect(self.x + c, self.y, 1, self.height, self.background)
+                    self.column(c)
+                self.new = 0
+                return width, self.height
+        self.range = self.fit()
+        panel.fill_rect(self.x, self.y, width, self.height, self.background)
+        for c in range(width):
+            self.column(c)
+        self.new = 0
+        return width, self.height
+
+class Screen:
+    """
+    Set of widgets redrawn together with one coalesced flush.
+    """
+    def __init__(self, disp):
+        self.disp = disp
+        self.widgets = []
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        return widget
+
+    def invalidate(self):
+        for widget in self.widgets:
+            widget.invalidate()
+
+    def update(self):
+        """Redraw dirty widgets; return the number redrawn.
+        """
+        count = 0
+        self.disp.defer()
+        try:
+            for widget in self.widgets:
+                if widget.render():
+                    count += 1
+        finally:
+            self.disp.flush()
+        return count